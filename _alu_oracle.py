@@ -0,0 +1,57 @@
+"""Reference ALU for the arithmetic tests, written independently of the pipeline."""
+
+from isa import Opcode
+from jit import njit
+
+# Opcode values as plain ints, which the JIT-compiled oracle can use
+_ADD, _ADDI = Opcode.ADD.value, Opcode.ADDI.value
+_SUB, _SUBI = Opcode.SUB.value, Opcode.SUBI.value
+_MUL, _MULI = Opcode.MUL.value, Opcode.MULI.value
+_DIV, _DIVI = Opcode.DIV.value, Opcode.DIVI.value
+_MOD, _MODI = Opcode.MOD.value, Opcode.MODI.value
+_AND, _ANDI = Opcode.AND.value, Opcode.ANDI.value
+_OR, _ORI = Opcode.OR.value, Opcode.ORI.value
+_XOR, _XORI = Opcode.XOR.value, Opcode.XORI.value
+_SHL, _SHR = Opcode.SHL.value, Opcode.SHR.value
+
+# Opcodes alu_ref covers, by operand form
+REGISTER_OPS = (Opcode.ADD, Opcode.SUB, Opcode.MUL, Opcode.DIV, Opcode.MOD,
+                Opcode.AND, Opcode.OR, Opcode.XOR)
+IMMEDIATE_OPS = (Opcode.ADDI, Opcode.SUBI, Opcode.MULI, Opcode.DIVI, Opcode.MODI,
+                 Opcode.ANDI, Opcode.ORI, Opcode.XORI, Opcode.SHL, Opcode.SHR)
+
+@njit(cache=True)
+def alu_ref(op, a, b):
+    """Compute the register value an arithmetic instruction writes.
+    
+    Args:
+        op: Opcode value
+        a: Value of rs1 (0 to 2**32 - 1)
+        b: Value of rs2, or the sign-extended immediate (0-31 for shifts)
+        
+    Returns:
+        The 32-bit result; division and modulo by zero give 0
+    """
+    if op == _ADD or op == _ADDI:
+        result = a + b
+    elif op == _SUB or op == _SUBI:
+        result = a - b
+    elif op == _MUL or op == _MULI:
+        result = a * b  # Wraps in 64 bits when compiled; the low 32 bits agree
+    elif op == _DIV or op == _DIVI:
+        result = a // b if b != 0 else 0
+    elif op == _MOD or op == _MODI:
+        result = a % b if b != 0 else 0
+    elif op == _AND or op == _ANDI:
+        result = a & b
+    elif op == _OR or op == _ORI:
+        result = a | b
+    elif op == _XOR or op == _XORI:
+        result = a ^ b
+    elif op == _SHL:
+        result = a << b
+    elif op == _SHR:
+        result = a >> b
+    else:
+        result = 0
+    return result & 0xFFFFFFFF
@@ -0,0 +1,309 @@
+"""Assembler hot path: operand parsing, instruction encoding and dispatch.
+
+Everything here is plain typed Python so the module can be compiled ahead
+of time with mypyc (``mypyc _asm_core.py``). A compiled extension module
+takes precedence over this file on import; without one the same code runs
+interpreted. Assembler in assembler.py stays the orchestrator and keeps
+the symbol table and error list.
+"""
+
+import re
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from isa import InstructionType, Opcode
+
+if TYPE_CHECKING:
+    from assembler import Assembler
+
+# Register name -> register number, for both lower and upper case spellings
+_REG_TABLE: Dict[str, int] = {f"r{i}": i for i in range(32)}
+_REG_TABLE.update({f"R{i}": i for i in range(32)})
+
+# Valid digits for each immediate base
+_DIGITS: Dict[int, frozenset] = {
+    2: frozenset('01'),
+    10: frozenset('0123456789'),
+    16: frozenset('0123456789abcdef'),
+}
+
+# One line of source: either a label declaration or a mnemonic with operands,
+# optionally followed by a comment
+LINE_RE = re.compile(
+    r'^\s*(?:(?P<label>[^\s#:]+)\s*:|(?P<mnem>[^\s#]+)(?:\s+(?P<ops>[^#]*?))?)?\s*(?:#.*)?$'
+)
+# Memory operand in the format [base, offset]
+_MEM_RE = re.compile(r'^\[\s*(.+)\s*,\s*(.+?)\s*\]$')
+# The common [rN, imm] spelling, with an offset int(s, 0) accepts as written
+_MEM_FAST_RE = re.compile(
+    r'\[\s*([rR]\d{1,2})\s*,\s*([+-]?(?:0[xX][0-9a-fA-F]+|0[bB][01]+|[1-9][0-9]*|0))\s*\]$'
+)
+
+def split_operands(ops: Optional[str]) -> List[str]:
+    """Split an operand list on the commas outside brackets.
+    
+    Fields are stripped but empty ones are kept, so a stray comma shows up
+    as an empty operand that the handlers reject.
+    
+    Returns:
+        The operand strings, or an empty list if there are no operands
+    """
+    if not ops:
+        return []
+    if '[' not in ops:  # No memory operand: every comma separates operands
+        return [op.strip() for op in ops.split(',')]
+    operands = []
+    start = 0
+    depth = 0
+    for i, char in enumerate(ops):
+        if char == '[':
+            depth += 1
+        elif char == ']':
+            depth -= 1
+        elif char == ',' and depth <= 0:
+            operands.append(ops[start:i].strip())
+            start = i + 1
+    operands.append(ops[start:].strip())
+    return operands
+
+def parse_register(reg_str: str) -> int:
+    """Parse a register string (e.g., 'r1') into a register number.
+    
+    Returns:
+        The register number, or -1 if the string is not a register
+    """
+    reg_str = reg_str.strip()
+    reg_num = _REG_TABLE.get(reg_str)
+    if reg_num is None:
+        reg_num = _REG_TABLE.get(reg_str.lower(), -1)
+    return reg_num
+
+def parse_immediate(imm_str: str) -> Optional[int]:
+    """Parse an immediate value string into an integer."""
+    imm_str = imm_str.strip()
+    if not imm_str:
+        return None
+        
+    # Optional sign
+    negative = imm_str[0] == '-'
+    if negative or imm_str[0] == '+':
+        imm_str = imm_str[1:]
+        
+    prefix = imm_str[:2].lower()
+    if prefix == '0x':  # Hexadecimal
+        base, body = 16, imm_str[2:].lower()
+    elif prefix == '0b':  # Binary
+        base, body = 2, imm_str[2:]
+    else:  # Decimal
+        base, body = 10, imm_str
+        
+    # Validate digits up front instead of catching ValueError from int()
+    if not body or not _DIGITS[base].issuperset(body):
+        return None
+    value = int(body, base)
+    return -value if negative else value
+
+def parse_memory_operand(operand: str) -> Tuple[int, Optional[int]]:
+    """Parse a memory operand in the format [base, offset].
+    
+    Returns:
+        Tuple of (base register or -1, offset or None)
+    """
+    operand = operand.strip()
+    match = _MEM_FAST_RE.match(operand)
+    if match is not None:
+        base_reg = _REG_TABLE.get(match.group(1))
+        if base_reg is not None:
+            return base_reg, int(match.group(2), 0)
+        
+    # Anything else goes through the general parsers for error reporting
+    match = _MEM_RE.match(operand)
+    if match is None:
+        return -1, None
+        
+    return parse_register(match.group(1)), parse_immediate(match.group(2))
+
+def _encode_rtype(opcode: Opcode, rd: int, rs1: int, rs2: int) -> int:
+    """Encode an arithmetic instruction with register operands."""
+    return ((opcode.value & 0x1F) << 25) | ((rd & 0x1F) << 20) | ((rs1 & 0x1F) << 15) | ((rs2 & 0x1F) << 10)
+
+def _encode_itype(opcode: Opcode, rd: int, rs1: int, imm: int) -> int:
+    """Encode an arithmetic instruction with an immediate operand."""
+    return ((opcode.value & 0x1F) << 25) | ((rd & 0x1F) << 20) | ((rs1 & 0x1F) << 15) | (imm & 0x3FF)
+
+def _encode_mem(opcode: Opcode, reg: int, rs1: int, imm: int) -> int:
+    """Encode a memory instruction; reg is LDR's rd or STR's source register."""
+    return (1 << 30) | ((opcode.value & 0x3) << 28) | ((reg & 0x1F) << 23) | ((rs1 & 0x1F) << 18) | (imm & 0x3FFFF)
+
+def _encode_ctrl(opcode: Opcode, rs1: int, imm: int) -> int:
+    """Encode a control instruction (register form for JMP/CAL/FLUSH, offset form otherwise)."""
+    word = (2 << 30) | ((opcode.value & 0x7) << 27)
+    if opcode in (Opcode.JMP, Opcode.CAL, Opcode.FLUSH):
+        return word | ((rs1 & 0x1F) << 22)
+    return word | (imm & 0x7FFFFFF)
+
+def _parse_rtype(asm: 'Assembler', opcode: Opcode, operands: List[str], line_num: int, resolve_labels: bool) -> Optional[int]:
+    """Parse an R-type arithmetic instruction: rd, rs1, rs2."""
+    # Parse all registers
+    rd = parse_register(operands[0])
+    rs1 = parse_register(operands[1])
+    rs2 = parse_register(operands[2])
+    
+    if rd < 0:
+        asm.add_error(line_num, f"Invalid destination register: {operands[0]}")
+        return None
+    if rs1 < 0:
+        asm.add_error(line_num, f"Invalid source register 1: {operands[1]}")
+        return None
+    if rs2 < 0:
+        asm.add_error(line_num, f"Invalid source register 2: {operands[2]}")
+        return None
+        
+    return _encode_rtype(opcode, rd, rs1, rs2)
+
+def _parse_itype(asm: 'Assembler', opcode: Opcode, operands: List[str], line_num: int, resolve_labels: bool) -> Optional[int]:
+    """Parse an I-type arithmetic instruction: rd, imm or rd, rs1, imm."""
+    # Parse destination register
+    rd = parse_register(operands[0])
+    if rd < 0:
+        asm.add_error(line_num, f"Invalid destination register: {operands[0]}")
+        return None
+
+    # Handle both formats: "rd, imm" and "rd, rs1, imm"
+    if len(operands) == 2:
+        # Format: rd, imm
+        imm = parse_immediate(operands[1])
+        if imm is None:
+            asm.add_error(line_num, f"Invalid immediate value: {operands[1]}")
+            return None
+        rs1 = 0  # Use r0 as source register
+    else:
+        # Format: rd, rs1, imm
+        rs1 = parse_register(operands[1])
+        if rs1 < 0:
+            asm.add_error(line_num, f"Invalid source register: {operands[1]}")
+            return None
+        imm = parse_immediate(operands[2])
+        if imm is None:
+            asm.add_error(line_num, f"Invalid immediate value: {operands[2]}")
+            return None
+
+    return _encode_itype(opcode, rd, rs1, imm)
+
+def _parse_cmp(asm: 'Assembler', opcode: Opcode, operands: List[str], line_num: int, resolve_labels: bool) -> Optional[int]:
+    """Parse a compare instruction: rs1, rs2."""
+    rs1 = parse_register(operands[0])
+    rs2 = parse_register(operands[1])
+    
+    if rs1 < 0:
+        asm.add_error(line_num, f"Invalid source register 1: {operands[0]}")
+        return None
+    if rs2 < 0:
+        asm.add_error(line_num, f"Invalid source register 2: {operands[1]}")
+        return None
+        
+    return _encode_rtype(opcode, 0, rs1, rs2)
+
+def _parse_memory(asm: 'Assembler', opcode: Opcode, operands: List[str], line_num: int, resolve_labels: bool) -> Optional[int]:
+    """Parse a memory instruction: reg, [base, offset]."""
+    reg = parse_register(operands[0])
+    if reg < 0:
+        if opcode == Opcode.LDR:
+            asm.add_error(line_num, f"Invalid destination register: {operands[0]}")
+        else:
+            asm.add_error(line_num, f"Invalid source register: {operands[0]}")
+        return None
+        
+    # Parse memory operand
+    rs1, imm = parse_memory_operand(operands[1])
+    if rs1 < 0:
+        asm.add_error(line_num, "Memory operand must be in [base, offset] format")
+        return None
+    if imm is None:
+        asm.add_error(line_num, "Invalid offset in memory operand")
+        return None
+        
+    # The memory format has one register field besides the base: LDR's rd,
+    # or STR's source register, which decodes as rs2
+    return _encode_mem(opcode, reg, rs1, imm)
+
+def _parse_branch(asm: 'Assembler', opcode: Opcode, operands: List[str], line_num: int, resolve_labels: bool) -> Optional[int]:
+    """Parse a conditional branch: immediate offset or label."""
+    # Try parsing as immediate first
+    imm = parse_immediate(operands[0])
+    if imm is None:
+        # If not an immediate, treat as label
+        if resolve_labels:
+            imm = asm.resolve_label(operands[0], line_num)
+            if imm is None:
+                return None
+        else:
+            # During first pass, just use 0 for the immediate
+            imm = 0
+            
+    return _encode_ctrl(opcode, 0, imm)
+
+def _parse_jump(asm: 'Assembler', opcode: Opcode, operands: List[str], line_num: int, resolve_labels: bool) -> Optional[int]:
+    """Parse a jump: register or label."""
+    # Try parsing as register first
+    rs1 = parse_register(operands[0])
+    if rs1 >= 0:
+        return _encode_ctrl(opcode, rs1, 0)
+        
+    # If not a register, try as label
+    if resolve_labels:
+        imm = asm.resolve_label(operands[0], line_num)
+        if imm is None:
+            return None
+    else:
+        # During first pass, just use 0 for the immediate
+        imm = 0
+        
+    # Return a JMP instruction with the label's address
+    return _encode_ctrl(opcode, 0, imm)
+
+def _parse_control_register(asm: 'Assembler', opcode: Opcode, operands: List[str], line_num: int, resolve_labels: bool) -> Optional[int]:
+    """Parse a register-based control instruction (CAL, FLUSH)."""
+    rs1 = parse_register(operands[0])
+    if rs1 < 0:
+        asm.add_error(line_num, "Invalid register")
+        return None
+        
+    return _encode_ctrl(opcode, rs1, 0)
+
+def _parse_halt(asm: 'Assembler', opcode: Opcode, operands: List[str], line_num: int, resolve_labels: bool) -> Optional[int]:
+    """Parse HALT, which takes no operands."""
+    return _encode_rtype(opcode, 0, 0, 0)
+
+# Accepted operand counts for each handler, and how they read in error messages.
+# parse_tokens checks the count, so handlers can index operands directly.
+_ARITY_TEXT = {
+    (0,): "no operands",
+    (1,): "1 operand",
+    (2,): "2 operands",
+    (3,): "3 operands",
+    (2, 3): "2 or 3 operands",
+}
+
+# Mnemonic -> (handler, operand counts, arity error, instruction type, opcode),
+# built once at import time
+DISPATCH: Dict[str, tuple] = {}
+for _names, _handler, _arity, _type in (
+    (('ADD', 'ADDS', 'SUB', 'SUBS', 'MUL', 'DIV', 'AND', 'OR', 'XOR', 'MOD'), _parse_rtype, (3,), InstructionType.ARITHMETIC),
+    (('ADDI', 'ADDIS', 'SUBI', 'SUBIS', 'MULI', 'DIVI', 'ANDI', 'ORI', 'XORI', 'MODI', 'MOVI'), _parse_itype, (2, 3), InstructionType.ARITHMETIC),
+    (('CMP',), _parse_cmp, (2,), InstructionType.ARITHMETIC),
+    (('HALT',), _parse_halt, (0,), InstructionType.ARITHMETIC),
+    (('LDR', 'STR'), _parse_memory, (2,), InstructionType.MEMORY),
+    (('BEQ', 'BLT'), _parse_branch, (1,), InstructionType.CONTROL),
+    (('JMP',), _parse_jump, (1,), InstructionType.CONTROL),
+    (('CAL', 'FLUSH'), _parse_control_register, (1,), InstructionType.CONTROL),
+):
+    for _name in _names:
+        DISPATCH[_name] = (_handler, _arity, f"Expected {_ARITY_TEXT[_arity]} for {_name}",
+                            _type, Opcode[_name])
+del _names, _handler, _arity, _type, _name
+
+# The same table grouped by first character: a mnemonic whose first letter
+# starts no instruction is rejected without hashing the whole string
+DISPATCH_BY_CHAR: Dict[str, Dict[str, tuple]] = {}
+for _name, _entry in DISPATCH.items():
+    DISPATCH_BY_CHAR.setdefault(_name[0], {})[_name] = _entry
+del _name, _entry
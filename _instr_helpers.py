@@ -0,0 +1,33 @@
+"""Instruction word builders shared by the pipeline tests."""
+
+from isa import Instruction, InstructionType, Opcode
+
+# Encoded words with every operand field zero. The helpers OR the operands
+# into them at the bit positions isa._encode_bits uses, instead of building
+# and encoding an Instruction per call.
+_ADD_WORD = Instruction(type=InstructionType.ARITHMETIC, opcode=Opcode.ADD,
+                        rd=0, rs1=0, rs2=0, imm=0).encode()
+_SUB_WORD = Instruction(type=InstructionType.ARITHMETIC, opcode=Opcode.SUB,
+                        rd=0, rs1=0, rs2=0, imm=0).encode()
+_LDR_WORD = Instruction(type=InstructionType.MEMORY, opcode=Opcode.LDR,
+                        rd=0, rs1=0, rs2=0, imm=0).encode()
+_STR_WORD = Instruction(type=InstructionType.MEMORY, opcode=Opcode.STR,
+                        rd=0, rs1=0, rs2=0, imm=0).encode()
+
+def create_add_instruction(rd: int, rs1: int, rs2: int) -> int:
+    """Create an ADD instruction."""
+    return _ADD_WORD | (rd & 0x1F) << 20 | (rs1 & 0x1F) << 15 | (rs2 & 0x1F) << 10
+
+def create_sub_instruction(rd: int, rs1: int, rs2: int) -> int:
+    """Create a SUB instruction."""
+    return _SUB_WORD | (rd & 0x1F) << 20 | (rs1 & 0x1F) << 15 | (rs2 & 0x1F) << 10
+
+def create_ldr_instruction(rd: int, base: int, offset: int) -> int:
+    """Create a LDR instruction."""
+    return _LDR_WORD | (rd & 0x1F) << 23 | (base & 0x1F) << 18 | offset & 0x3FFFF
+
+def create_str_instruction(src: int, base: int, offset: int) -> int:
+    """Create a STR instruction."""
+    # The memory format has one register field besides the base; for a store
+    # it holds the source register, which decodes as rs2
+    return _STR_WORD | (src & 0x1F) << 23 | (base & 0x1F) << 18 | offset & 0x3FFFF
@@ -0,0 +1,641 @@
+"""Pipeline hot path: stage registers, the five stages and hazard handling.
+
+Everything here is plain typed Python so the module can be compiled ahead
+of time with mypyc (``mypyc _pipeline_core.py``). A compiled extension
+module takes precedence over this file on import; without one the same
+code runs interpreted. pipeline.py re-exports the public names.
+"""
+
+from typing import Callable, List, Dict, Tuple, Optional
+import logging
+from enum import IntEnum
+from registers import RegisterFile, Flags, SpecialRegisters
+from memory import MemorySystem
+from isa import Instruction, Opcode, InstructionType
+
+# Named after the public module, so logging config for "pipeline" still applies
+log = logging.getLogger("pipeline")
+
+class PipelineStage(IntEnum):
+    # Values are indices into Pipeline.stages
+    FETCH = 0
+    DECODE = 1
+    EXECUTE = 2
+    MEMORY = 3
+    WRITEBACK = 4
+
+# Plain int stage indices for the per-cycle paths
+_FETCH, _DECODE, _EXECUTE, _MEMORY, _WRITEBACK = range(5)
+
+class HazardType(IntEnum):
+    # IntEnum so hazard comparisons are plain int compares; NONE is 0 (falsy)
+    NONE = 0
+    RAW = 1  # Read After Write
+    WAR = 2  # Write After Read
+    WAW = 3  # Write After Write
+    CONTROL = 4
+    STRUCTURAL = 5
+
+class StepStatus(IntEnum):
+    # Returned by Pipeline.step; CONTINUE is 0 (falsy), so callers can test
+    # a status with a plain truth check
+    CONTINUE = 0
+    HALT = 1  # A HALT instruction has retired
+
+class PipelineRegister:
+    # Stage registers are read and written several times per cycle, so use
+    # slots instead of a per-instance dict (a plain class, since dataclass
+    # defaults conflict with hand-written __slots__)
+    __slots__ = ('instruction', 'pc', 'rs1', 'rs2', 'rd', 'imm', 'alu_result',
+                 'memory_data', 'write_back', 'hazard')
+    
+    def __init__(self, instruction: Optional[Instruction] = None, pc: int = 0, rs1: int = 0,
+                 rs2: int = 0, rd: int = 0, imm: int = 0, alu_result: int = 0,
+                 memory_data: int = 0, write_back: bool = False,
+                 hazard: HazardType = HazardType.NONE):
+        self.instruction = instruction
+        self.pc = pc
+        self.rs1 = rs1
+        self.rs2 = rs2
+        self.rd = rd
+        self.imm = imm
+        self.alu_result = alu_result
+        self.memory_data = memory_data
+        self.write_back = write_back
+        self.hazard = hazard
+    
+    def reset(self) -> None:
+        """Restore the default (empty) register contents in place."""
+        self.instruction = None
+        self.pc = 0
+        self.rs1 = 0
+        self.rs2 = 0
+        self.rd = 0
+        self.imm = 0
+        self.alu_result = 0
+        self.memory_data = 0
+        self.write_back = False
+        self.hazard = HazardType.NONE
+
+# ALU operation for each arithmetic opcode, applied to the execute stage register
+_ARITH_OPS: Dict[Opcode, Callable[[PipelineRegister], int]] = {
+    Opcode.ADD: lambda r: r.rs1 + r.rs2,
+    Opcode.ADDS: lambda r: r.rs1 + r.rs2,
+    Opcode.ADDI: lambda r: r.rs1 + r.imm,
+    Opcode.ADDIS: lambda r: r.rs1 + r.imm,
+    Opcode.SUB: lambda r: r.rs1 - r.rs2,
+    Opcode.SUBS: lambda r: r.rs1 - r.rs2,
+    Opcode.SUBI: lambda r: r.rs1 - r.imm,
+    Opcode.SUBIS: lambda r: r.rs1 - r.imm,
+    Opcode.MUL: lambda r: r.rs1 * r.rs2,
+    Opcode.MULI: lambda r: r.rs1 * r.imm,
+    Opcode.DIV: lambda r: r.rs1 // r.rs2 if r.rs2 != 0 else 0,
+    Opcode.DIVI: lambda r: r.rs1 // r.imm if r.imm != 0 else 0,
+    Opcode.AND: lambda r: r.rs1 & r.rs2,
+    Opcode.ANDI: lambda r: r.rs1 & r.imm,
+    Opcode.OR: lambda r: r.rs1 | r.rs2,
+    Opcode.ORI: lambda r: r.rs1 | r.imm,
+    Opcode.XOR: lambda r: r.rs1 ^ r.rs2,
+    Opcode.XORI: lambda r: r.rs1 ^ r.imm,
+    Opcode.SHL: lambda r: r.rs1 << r.imm,
+    Opcode.SHR: lambda r: r.rs1 >> r.imm,
+    Opcode.CMP: lambda r: r.rs1 - r.rs2,
+    Opcode.MOD: lambda r: r.rs1 % r.rs2 if r.rs2 != 0 else 0,
+    Opcode.MODI: lambda r: r.rs1 % r.imm if r.imm != 0 else 0,
+    Opcode.MOV: lambda r: r.rs1,
+    Opcode.MOVI: lambda r: r.imm,
+}
+
+# Memory opcodes, which compute their address as rs1 + imm
+_ADDRESS_OPS = frozenset({Opcode.LDR, Opcode.STR})
+
+# Execute-stage handlers for the control opcodes
+
+def _jump(pipeline: 'Pipeline', execute: PipelineRegister) -> None:
+    """JMP/CAL: jump to rs1 + imm."""
+    pipeline.pc = execute.rs1 + execute.imm
+    pipeline.flush_pipeline()
+
+def _branch_if_zero(pipeline: 'Pipeline', execute: PipelineRegister) -> None:
+    """BEQ: branch relative to the instruction's PC if the zero flag is set."""
+    if pipeline.registers.get_zero_flag():
+        pipeline.pc = execute.pc + execute.imm
+        pipeline.flush_pipeline()
+
+def _branch_if_negative(pipeline: 'Pipeline', execute: PipelineRegister) -> None:
+    """BLT: branch relative to the instruction's PC if the negative flag is set."""
+    if pipeline.registers.get_negative_flag():
+        pipeline.pc = execute.pc + execute.imm
+        pipeline.flush_pipeline()
+
+def _flush_line(pipeline: 'Pipeline', execute: PipelineRegister) -> None:
+    """FLUSH: write back the cache line holding rs1."""
+    pipeline.memory.flush_cache_line(execute.rs1)
+
+_CONTROL_OPS: Dict[Opcode, Callable[['Pipeline', PipelineRegister], None]] = {
+    Opcode.JMP: _jump,
+    Opcode.BEQ: _branch_if_zero,
+    Opcode.BLT: _branch_if_negative,
+    Opcode.CAL: _jump,
+    Opcode.FLUSH: _flush_line,
+}
+
+class Pipeline:
+    def __init__(self, memory: MemorySystem, registers: RegisterFile):
+        """Initialize pipeline."""
+        self.memory = memory
+        self.registers = registers
+        # Memory size in bytes for the fetch bounds check; MemorySystem never
+        # resizes its word array (reset and load_program fill it in place)
+        self._mem_size_bytes = len(memory.memory) * 4
+        self.pc = 0
+        # Stage registers indexed by PipelineStage (or the _FETCH..._WRITEBACK ints)
+        self.stages: List[PipelineRegister] = [PipelineRegister() for _ in PipelineStage]
+        # Same list, kept for callers that walk every stage
+        self.stages_list = self.stages
+        self.stalled = False
+        self.flushed = False
+        self.cycles = 0  # Initialize cycles counter
+        self.instructions = 0  # Track completed instructions
+        self.stall_count = 0  # Track number of stalls
+        self.flush_count = 0  # Track number of flushes
+        self.enabled = True  # Pipeline enabled by default
+        self.sequential_stage = 0  # 0=fetch, 1=decode, 2=execute, 3=memory, 4=writeback
+        self.halted = False  # Set when a HALT instruction retires
+        # Write arithmetic results to the register file in execute rather than
+        # writeback. Results are the same (later stages and forwarding then have
+        # nothing to do for them), but register contents update two stages early.
+        self.early_writeback = False
+        # Decoded instruction (or None if invalid) by instruction word. Keyed by
+        # the word rather than the PC, so stores to code need no invalidation;
+        # decoding is pure and Instructions are immutable, so entries can be shared.
+        self._decode_cache: Dict[int, Optional[Instruction]] = {}
+    
+    def reset(self) -> None:
+        """Reset pipeline state."""
+        self.pc = 0
+        for stage in self.stages:
+            stage.reset()
+        self.stalled = False
+        self.flushed = False
+        self.cycles = 0  # Reset cycle count
+        self.instructions = 0  # Reset instruction count
+        self.stall_count = 0  # Reset stall count
+        self.flush_count = 0  # Reset flush count
+        self.sequential_stage = 0
+        self.halted = False
+    
+    def detect_hazard(self, stage: PipelineStage) -> HazardType:
+        """Detect hazards for a stage."""
+        current = self.stages[stage]
+        if not current.instruction:
+            return HazardType.NONE
+        
+        # Check for RAW hazards: bit i of pending is set when register i has an
+        # in-flight writer; bit 0 is masked off since R0 is never written
+        execute = self.stages[_EXECUTE]
+        memory = self.stages[_MEMORY]
+        
+        pending = 0
+        if execute.instruction and execute.write_back:
+            pending = 1 << execute.rd
+        if memory.instruction and memory.write_back:
+            pending |= 1 << memory.rd
+        if pending & ((1 << current.instruction.rs1) | (1 << current.instruction.rs2)) & ~1:
+            return HazardType.RAW
+        
+        # No WAR/WAW checks: registers are read in decode and written back in
+        # program order, which is what a rename table would guarantee, so
+        # those orderings can never produce a wrong value and need no stall
+        return HazardType.NONE
+    
+    def forward_data(self, stage: PipelineStage) -> None:
+        """Forward data to resolve hazards."""
+        if stage == PipelineStage.FETCH:
+            return
+        
+        stages = self.stages
+        current = stages[stage]
+        instruction = current.instruction
+        if not instruction:
+            return
+        rs1 = instruction.rs1
+        rs2 = instruction.rs2
+        
+        # Forward from EXECUTE stage (higher priority)
+        execute = stages[_EXECUTE]
+        ex_rd = execute.rd
+        if execute.instruction and execute.write_back and ex_rd != 0:  # Don't forward from R0
+            if rs1 == ex_rd:
+                current.rs1 = execute.alu_result
+            if rs2 == ex_rd:
+                current.rs2 = execute.alu_result
+        
+        # Forward from MEMORY stage (lower priority)
+        memory = stages[_MEMORY]
+        mem_rd = memory.rd
+        mem_instruction = memory.instruction
+        # Only forward from memory if execute stage isn't forwarding the same register
+        if mem_instruction and memory.write_back and mem_rd != 0 and mem_rd != ex_rd:
+            if rs1 == mem_rd or rs2 == mem_rd:
+                if mem_instruction.is_ldr:
+                    value = memory.memory_data
+                else:
+                    value = memory.alu_result
+                if rs1 == mem_rd:
+                    current.rs1 = value
+                if rs2 == mem_rd:
+                    current.rs2 = value
+    
+    def handle_hazard(self, stage: PipelineStage) -> None:
+        """Handle detected hazards."""
+        hazard = self.detect_hazard(stage)
+        if hazard == HazardType.NONE:
+            return
+        
+        if hazard == HazardType.CONTROL:
+            self.flush_pipeline()
+        elif hazard == HazardType.RAW:
+            # Forward data instead of stalling
+            self.forward_data(stage)
+    
+    def stall_pipeline(self) -> None:
+        """Stall the pipeline."""
+        self.stalled = True
+    
+    def flush_pipeline(self) -> None:
+        """Flush the pipeline."""
+        self.flushed = True
+        for stage in self.stages:
+            stage.instruction = None
+            stage.write_back = False
+    
+    def fetch(self) -> None:
+        """Fetch stage."""
+        if self.stalled or self.flushed:
+            return
+        
+        # Check if PC is within valid memory range
+        if not 0 <= self.pc < self._mem_size_bytes:
+            self.stages[_FETCH].instruction = None
+            return
+        
+        # Fetch instruction from memory
+        try:
+            instruction_data, _ = self.memory.read(self.pc, is_instruction_fetch=True)
+            decoded = self._decode_cache
+            if instruction_data in decoded:
+                instruction = decoded[instruction_data]
+            else:
+                instruction = decoded[instruction_data] = Instruction.decode(instruction_data)
+            if instruction is None:
+                log.debug("FETCH: Invalid instruction at PC=%s", self.pc)
+                self.stages[_FETCH].instruction = None
+                return
+            
+            log.debug("FETCH: %s", instruction)
+            
+            # Update pipeline register
+            fetch = self.stages[_FETCH]
+            fetch.instruction = instruction
+            fetch.pc = self.pc  # Save current PC value
+            
+            # No hazard handling here: forward_data ignores the fetch stage,
+            # so the RAW check would have nothing to act on
+            
+        except Exception as e:
+            log.debug("FETCH: Error fetching instruction at PC=%s: %s", self.pc, e)
+            self.stages[_FETCH].instruction = None
+    
+    def decode(self) -> None:
+        """Decode stage."""
+        if self.stalled or self.flushed:
+            return
+        
+        # Get instruction from fetch stage
+        fetch = self.stages[_FETCH]
+        if not fetch.instruction:
+            self.stages[_DECODE].instruction = None
+            return
+        
+        # Move instruction to decode stage
+        decode = self.stages[_DECODE]
+        decode.instruction = fetch.instruction
+        decode.pc = fetch.pc
+        
+        # Decode instruction fields
+        instruction = fetch.instruction
+        decode.rs1, decode.rs2, decode.rd, decode.imm = instruction.fields
+        
+        # Read register values straight from the general purpose register list
+        # (rs1/rs2 are 5-bit fields, so always R0-R31)
+        gprs = self.registers.registers
+        if instruction.rs1 != 0:  # Don't read R0
+            decode.rs1 = gprs[instruction.rs1]
+        if instruction.rs2 != 0:  # Don't read R0
+            decode.rs2 = gprs[instruction.rs2]
+        
+        # Resolve RAW hazards by forwarding; one pass over execute/memory
+        # covers what handle_hazard followed by forward_data used to do
+        self.forward_data(PipelineStage.DECODE)
+        
+        log.debug("DECODE: %s", instruction)
+        
+    def execute(self) -> None:
+        """Execute stage."""
+        if self.stalled or self.flushed:
+            return
+        
+        # Get instruction from decode stage
+        stages = self.stages
+        decode = stages[_DECODE]
+        instruction = decode.instruction
+        execute = stages[_EXECUTE]
+        if not instruction:
+            execute.instruction = None
+            return
+        
+        # Move instruction to execute stage
+        execute.instruction = instruction
+        execute.pc = decode.pc
+        execute.rs1 = decode.rs1
+        execute.rs2 = decode.rs2
+        execute.rd = decode.rd
+        execute.imm = decode.imm
+        
+        # Decode could only forward a load's address from EX; the memory stage
+        # has run by now this cycle, so take the loaded value instead
+        memory = stages[_MEMORY]
+        mem_instruction = memory.instruction
+        if mem_instruction is not None and mem_instruction.is_ldr and memory.rd != 0:
+            if instruction.rs1 == memory.rd:
+                execute.rs1 = memory.memory_data
+            if instruction.rs2 == memory.rd:
+                execute.rs2 = memory.memory_data
+        
+        # Execute instruction
+        result = 0
+        
+        opcode = instruction.opcode
+        instr_type = instruction.type
+        if instr_type == InstructionType.ARITHMETIC:
+            op = _ARITH_OPS.get(opcode)
+            if op is not None:
+                result = op(execute)
+                if instruction.sets_flags:
+                    self.registers.update_flags(result)
+            # Writing early is only safe when no older instruction still has to
+            # write the same register: MEM holds the one right before this
+            # (writeback has already run this cycle), e.g. a load to the same rd,
+            # whose later write would otherwise overwrite this newer result
+            if self.early_writeback and not (memory.instruction is not None
+                                             and memory.write_back
+                                             and memory.rd == execute.rd):
+                self.registers.set(execute.rd, result)  # Ignored for R0
+                execute.write_back = False
+            else:
+                execute.write_back = True
+        
+        elif instr_type == InstructionType.MEMORY:
+            if opcode in _ADDRESS_OPS:
+                result = execute.rs1 + execute.imm  # Calculate memory address
+            execute.write_back = opcode == Opcode.LDR
+        
+        elif instr_type == InstructionType.CONTROL:
+            handler = _CONTROL_OPS.get(opcode)
+            if handler is not None:
+                handler(self, execute)
+            execute.write_back = False
+        
+        # Store result
+        execute.alu_result = result
+        
+        # Resolve RAW hazards by forwarding; one pass over execute/memory
+        # covers what handle_hazard followed by forward_data used to do
+        self.forward_data(PipelineStage.EXECUTE)
+        
+        log.debug("EXECUTE: %s", instruction)
+    
+    def memory_stage(self) -> None:
+        """Memory stage."""
+        if self.stalled or self.flushed:
+            return
+        
+        # Get instruction from execute stage
+        execute = self.stages[_EXECUTE]
+        if not execute.instruction:
+            return
+        
+        # Move instruction to memory stage
+        memory = self.stages[_MEMORY]
+        memory.instruction = execute.instruction
+        memory.pc = execute.pc
+        memory.rd = execute.rd
+        memory.alu_result = execute.alu_result
+        memory.write_back = execute.write_back
+        
+        # Handle memory operations
+        instruction = execute.instruction
+        if instruction.type == InstructionType.MEMORY:
+            if instruction.opcode == Opcode.LDR:
+                # Load from memory
+                addr = execute.alu_result
+                data, _ = self.memory.read(addr)
+                memory.alu_result = data  # Store loaded data in alu_result
+                memory.memory_data = data  # and where forwarding reads it
+                memory.write_back = True
+            elif instruction.opcode == Opcode.STR:
+                # Store to memory
+                addr = execute.alu_result
+                self.memory.write(addr, execute.rs2)
+                memory.write_back = False
+        
+        # Clear execute stage
+        self.stages[_EXECUTE].instruction = None
+        
+        # Resolve RAW hazards by forwarding; one pass over execute/memory
+        # covers what handle_hazard followed by forward_data used to do
+        self.forward_data(PipelineStage.MEMORY)
+        
+        log.debug("MEMORY: %s", instruction)
+    
+    def writeback(self) -> None:
+        """Writeback stage."""
+        if self.stalled or self.flushed:
+            return
+        
+        # Get instruction from memory stage
+        memory = self.stages[_MEMORY]
+        if not memory.instruction:
+            return
+        
+        # Get result from memory stage
+        instruction = memory.instruction
+        result = memory.alu_result
+        
+        # Update register file if needed
+        if memory.write_back:
+            if instruction.rd != 0:  # Don't write to R0
+                self.registers.set(instruction.rd, result)
+                log.debug("WRITEBACK: r%s = %s", instruction.rd, result)
+        
+        # Clear memory stage
+        self.stages[_MEMORY].instruction = None
+        
+        # Update instruction count
+        self.instructions += 1
+        if instruction.opcode is Opcode.HALT:
+            self.halted = True
+    
+    def clear_pipeline_stages(self):
+        for stage in self.stages:
+            stage.instruction = None
+
+    def _shift_stage(self, source: int, target: int) -> None:
+        """Move the source stage register to the target stage.
+        
+        The target's old register is cleared and reused as the new, empty
+        source register rather than allocating a fresh one.
+        """
+        stages = self.stages
+        spare = stages[target]
+        stages[target] = stages[source]
+        spare.reset()
+        stages[source] = spare
+    
+    def advance_sequential_stage(self):
+        """Move instruction from previous stage to current stage."""
+        if self.sequential_stage == 0:  # FETCH
+            self.fetch()
+        elif self.sequential_stage == 1:  # DECODE
+            # Move instruction from fetch to decode
+            self._shift_stage(_FETCH, _DECODE)
+            self.decode()
+        elif self.sequential_stage == 2:  # EXECUTE
+            # Move instruction from decode to execute
+            self._shift_stage(_DECODE, _EXECUTE)
+            self.execute()
+        elif self.sequential_stage == 3:  # MEMORY
+            # Move instruction from execute to memory
+            self._shift_stage(_EXECUTE, _MEMORY)
+            self.memory_stage()
+        elif self.sequential_stage == 4:  # WRITEBACK
+            # Move instruction from memory to writeback
+            self._shift_stage(_MEMORY, _WRITEBACK)
+            self.writeback()
+            self.cycles += 5  # Only increment after a full instruction
+        
+        # Move to next stage
+        self.sequential_stage = (self.sequential_stage + 1) % 5
+
+    def step(self) -> StepStatus:
+        """Execute one pipeline cycle.
+        
+        Returns:
+            StepStatus.HALT once a HALT instruction has retired, else CONTINUE
+        """
+        if self.enabled:
+            return self._step_pipelined()
+        return self._step_sequential()
+    
+    def _step_sequential(self) -> StepStatus:
+        """Execute one stage of the current instruction (pipeline disabled)."""
+        if self.sequential_stage == 0:  # Fetch
+            self.fetch()
+            self.sequential_stage = 1
+        elif self.sequential_stage == 1:  # Decode
+            self.decode()
+            self.sequential_stage = 2
+        elif self.sequential_stage == 2:  # Execute
+            self.execute()
+            self.sequential_stage = 3
+        elif self.sequential_stage == 3:  # Memory
+            self.memory_stage()
+            self.sequential_stage = 4
+        elif self.sequential_stage == 4:  # Writeback
+            self.writeback()
+            self.sequential_stage = 0
+            # Update PC after completing the instruction
+            if not self.stalled and not self.flushed:
+                self.pc += 4
+                self.instructions += 1  # Count completed instruction
+        self.cycles += 1  # Increment cycles for each step
+        return StepStatus.HALT if self.halted else StepStatus.CONTINUE
+    
+    def _step_pipelined(self) -> StepStatus:
+        """Execute one cycle of all five stages (pipeline enabled)."""
+        # Execute stages in reverse order to avoid overwriting data
+        self.writeback()
+        if self.halted:
+            # Instructions younger than HALT never complete: squash them before
+            # the memory and execute stages can store or write registers
+            self.clear_pipeline_stages()
+            return StepStatus.HALT
+        self.memory_stage()
+        self.execute()
+        self.decode()
+        self.fetch()
+        
+        # Update PC after fetch if not stalled or flushed
+        if not self.stalled and not self.flushed:
+            self.pc += 4
+        
+        # Log pipeline state; the empty-stage scan only feeds the log, so it
+        # is skipped entirely unless debug output is on
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Pipeline state: PC=%s", self.pc)
+            if all(stage.instruction is None for stage in self.stages):
+                log.debug("All pipeline stages are empty. Program complete.")
+        return StepStatus.HALT if self.halted else StepStatus.CONTINUE
+
+    def run(self, num_cycles: int) -> None:
+        """Run pipeline for specified number of cycles."""
+        # enabled cannot change during a run, so pick the step variant once
+        step = self._step_pipelined if self.enabled else self._step_sequential
+        for _ in range(num_cycles):
+            step()
+    
+    def run_for(self, max_cycles: int, stop: Optional[Callable[[], bool]] = None) -> int:
+        """Run up to max_cycles cycles, stopping early once HALT retires or stop() returns True.
+        
+        stop is checked before every cycle, so a batch ends on the same cycle
+        as a per-step loop with the same check would. A halted pipeline runs
+        no further cycles.
+        
+        Returns:
+            Number of cycles run; less than max_cycles only if the run stopped
+            early (check halted to tell a HALT apart from a full batch)
+        """
+        if self.halted:
+            return 0
+        step = self._step_pipelined if self.enabled else self._step_sequential
+        if stop is None:
+            for cycle in range(max_cycles):
+                if step():
+                    return cycle + 1
+            return max_cycles
+        for cycle in range(max_cycles):
+            if stop():
+                return cycle
+            if step():
+                return cycle + 1
+        return max_cycles
+
+    def run_until_retired(self, count: int, max_cycles: int) -> int:
+        """Run until count more instructions have retired, for at most max_cycles cycles.
+        
+        Returns:
+            Number of cycles run
+        """
+        target = self.instructions + count
+        return self.run_for(max_cycles, lambda: self.instructions >= target)
+    
+    def get_stats(self) -> Dict[str, float]:
+        """Get pipeline statistics."""
+        return {
+            "cycles": self.cycles,
+            "instructions": self.instructions,
+            "cpi": self.cycles / max(1, self.instructions),
+            "stalls": self.stall_count,
+            "flushes": self.flush_count
+        } 
\ No newline at end of file
@@ -1,6 +1,14 @@
+import logging
+import sys
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
-from isa import Instruction, InstructionType, Opcode
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from isa import Instruction
+from _asm_core import (
+    DISPATCH_BY_CHAR, LINE_RE,
+    parse_immediate, parse_memory_operand, parse_register, split_operands,
+)
+
+log = logging.getLogger(__name__)
 
 @dataclass
 class Symbol:
@@ -8,10 +16,19 @@ class Symbol:
     name: str
     address: int
 
+class Token(NamedTuple):
+    """One tokenized source line: a label declaration or an instruction."""
+    line_num: int
+    label: Optional[str]  # Label name, or None for an instruction
+    mnemonic: str  # Upper-case mnemonic, or '' for a label
+    operands: List[str]
+    line: str  # Stripped source line
+
 class Assembler:
     def __init__(self):
         """Initialize the assembler."""
         self.symbols: Dict[str, Symbol] = {}  # Symbol table
+        self.addr_to_label: Dict[int, Symbol] = {}  # Reverse symbol table
         self.current_address = 0  # Current instruction address
         self.instructions: List[int] = []  # List of encoded instructions
         self.errors: List[str] = []  # List of assembly errors
@@ -19,6 +36,7 @@ class Assembler:
     def reset(self) -> None:
         """Reset assembler state."""
         self.symbols.clear()
+        self.addr_to_label.clear()
         self.current_address = 0
         self.instructions.clear()
         self.errors.clear()
@@ -31,410 +49,148 @@ class Assembler:
         """Parse a register string (e.g., 'r1') into a register number."""
         if not reg_str:
             return None
-            
-        # Remove whitespace and convert to lowercase
-        reg_str = reg_str.strip().lower()
-        
-        if not reg_str.startswith('r'):
-            return None
-            
-        try:
-            reg_num = int(reg_str[1:])
-            if 0 <= reg_num <= 31:
-                return reg_num
-        except ValueError:
-            pass
-        return None
+        reg_num = parse_register(reg_str)
+        return reg_num if reg_num >= 0 else None
     
     def parse_immediate(self, imm_str: str) -> Optional[int]:
         """Parse an immediate value string into an integer."""
-        try:
-            # Handle hexadecimal
-            if imm_str.startswith('0x'):
-                return int(imm_str[2:], 16)
-            # Handle binary
-            elif imm_str.startswith('0b'):
-                return int(imm_str[2:], 2)
-            # Handle decimal
-            else:
-                return int(imm_str)
-        except ValueError:
-            return None
+        return parse_immediate(imm_str)
     
     def parse_memory_operand(self, operand: str) -> Tuple[Optional[int], Optional[int]]:
         """Parse a memory operand in the format [base, offset]."""
-        operand = operand.strip()
-        if not (operand.startswith('[') and operand.endswith(']')):
-            return None, None
-            
-        # Remove brackets and split by comma
-        operand = operand[1:-1].strip()
-        if ',' not in operand:
-            return None, None
-            
-        # Split on the last comma to handle nested commas
-        parts = operand.rsplit(',', 1)
-        if len(parts) != 2:
-            return None, None
-            
-        base, offset = [part.strip() for part in parts]
-        
-        # Parse base register and offset
-        base_reg = self.parse_register(base)
-        offset_val = self.parse_immediate(offset)
-        
-        return base_reg, offset_val
+        base_reg, offset_val = parse_memory_operand(operand)
+        return (base_reg if base_reg >= 0 else None), offset_val
     
-    def parse_instruction(self, line: str, line_num: int, resolve_labels: bool = False) -> Optional[Instruction]:
-        """Parse a single line of assembly code into an instruction."""
-        # Remove comments and whitespace
-        line = line.split('#')[0].strip()
-        if not line:
-            return None
-            
-        # Split into parts and handle operands
-        parts = line.split(None, 1)  # Split into mnemonic and the rest
-        if not parts:
+    def resolve_label(self, label: str, line_num: int) -> Optional[int]:
+        """Resolve a label into a word offset relative to the next instruction."""
+        symbol = self.symbols.get(sys.intern(label))
+        if symbol is None:
+            self.add_error(line_num, f"Undefined label: {label}")
             return None
-            
-        mnemonic = parts[0].upper()  # Convert mnemonic to uppercase
-        if len(parts) > 1:
-            # For memory instructions, split only on first comma
-            if mnemonic in ['LDR', 'STR']:
-                operands = [op.strip() for op in parts[1].split(',', 1)]
-            else:
-                # Split operands by comma, handling whitespace
-                operands = [op.strip() for op in parts[1].split(',')]
-        else:
-            operands = []
+        # Calculate relative offset in words (4 bytes per instruction)
+        target_addr = symbol.address
+        current_addr = self.current_address + 4  # PC points to next instruction
+        return (target_addr - current_addr) >> 2
+    
+    def tokenize(self, source: str) -> List[Token]:
+        """Tokenize source code into one Token per label or instruction.
         
-        # Parse based on instruction type
-        if mnemonic in ['ADD', 'ADDS', 'SUB', 'SUBS', 'MUL', 'DIV', 'AND', 'OR', 'XOR', 'MOD']:
-            # R-type arithmetic instructions
-            if len(operands) != 3:
-                self.add_error(line_num, f"Expected 3 operands for {mnemonic}")
-                return None
-                
-            # Parse all registers
-            rd = self.parse_register(operands[0])
-            rs1 = self.parse_register(operands[1])
-            rs2 = self.parse_register(operands[2])
-            
-            if rd is None:
-                self.add_error(line_num, f"Invalid destination register: {operands[0]}")
-                return None
-            if rs1 is None:
-                self.add_error(line_num, f"Invalid source register 1: {operands[1]}")
-                return None
-            if rs2 is None:
-                self.add_error(line_num, f"Invalid source register 2: {operands[2]}")
-                return None
-                
-            return Instruction(
-                type=InstructionType.ARITHMETIC,
-                opcode=Opcode[mnemonic],
-                rd=rd,
-                rs1=rs1,
-                rs2=rs2,
-                imm=0
-            )
-            
-        elif mnemonic in ['ADDI', 'ADDIS', 'SUBI', 'SUBIS', 'MULI', 'DIVI', 'ANDI', 'ORI', 'XORI', 'MODI', 'MOVI']:
-            # I-type arithmetic instructions
-            if len(operands) != 2 and len(operands) != 3:
-                self.add_error(line_num, f"Expected 2 or 3 operands for {mnemonic}")
-                return None
-                
-            # Parse destination register
-            rd = self.parse_register(operands[0])
-            if rd is None:
-                self.add_error(line_num, f"Invalid destination register: {operands[0]}")
-                return None
-
-            # Handle both formats: "rd, imm" and "rd, rs1, imm"
-            if len(operands) == 2:
-                # Format: rd, imm
-                imm = self.parse_immediate(operands[1])
-                if imm is None:
-                    self.add_error(line_num, f"Invalid immediate value: {operands[1]}")
-                    return None
-                rs1 = 0  # Use r0 as source register
-            else:
-                # Format: rd, rs1, imm
-                rs1 = self.parse_register(operands[1])
-                if rs1 is None:
-                    self.add_error(line_num, f"Invalid source register: {operands[1]}")
-                    return None
-                imm = self.parse_immediate(operands[2])
-                if imm is None:
-                    self.add_error(line_num, f"Invalid immediate value: {operands[2]}")
-                    return None
-
-            return Instruction(
-                type=InstructionType.ARITHMETIC,
-                opcode=Opcode[mnemonic],
-                rd=rd,
-                rs1=rs1,
-                rs2=0,
-                imm=imm
-            )
-            
-        elif mnemonic == 'CMP':
-            # Compare instruction
-            if len(operands) != 2:
-                self.add_error(line_num, f"Expected 2 operands for {mnemonic}")
-                return None
-                
-            rs1 = self.parse_register(operands[0])
-            rs2 = self.parse_register(operands[1])
-            
-            if rs1 is None:
-                self.add_error(line_num, f"Invalid source register 1: {operands[0]}")
-                return None
-            if rs2 is None:
-                self.add_error(line_num, f"Invalid source register 2: {operands[1]}")
-                return None
-                
-            return Instruction(
-                type=InstructionType.ARITHMETIC,
-                opcode=Opcode.CMP,
-                rd=0,
-                rs1=rs1,
-                rs2=rs2,
-                imm=0
-            )
-            
-        elif mnemonic in ['LDR', 'STR']:
-            # Memory instructions
-            if len(operands) != 2:
-                self.add_error(line_num, f"Expected 2 operands for {mnemonic}")
-                return None
-                
-            if mnemonic == 'LDR':
-                rd = self.parse_register(operands[0])
-                if rd is None:
-                    self.add_error(line_num, f"Invalid destination register: {operands[0]}")
-                    return None
-                    
-                # Parse memory operand
-                rs1, imm = self.parse_memory_operand(operands[1])
-                if rs1 is None:
-                    self.add_error(line_num, "Memory operand must be in [base, offset] format")
-                    return None
-                if imm is None:
-                    self.add_error(line_num, "Invalid offset in memory operand")
-                    return None
-                    
-                return Instruction(
-                    type=InstructionType.MEMORY,
-                    opcode=Opcode.LDR,
-                    rd=rd,
-                    rs1=rs1,
-                    rs2=0,
-                    imm=imm
-                )
-            else:  # STR
-                rs2 = self.parse_register(operands[0])
-                if rs2 is None:
-                    self.add_error(line_num, f"Invalid source register: {operands[0]}")
-                    return None
-                    
-                # Parse memory operand
-                rs1, imm = self.parse_memory_operand(operands[1])
-                if rs1 is None:
-                    self.add_error(line_num, "Memory operand must be in [base, offset] format")
-                    return None
-                if imm is None:
-                    self.add_error(line_num, "Invalid offset in memory operand")
-                    return None
-                    
-                return Instruction(
-                    type=InstructionType.MEMORY,
-                    opcode=Opcode.STR,
-                    rd=0,
-                    rs1=rs1,
-                    rs2=rs2,
-                    imm=imm
-                )
-                
-        elif mnemonic in ['BEQ', 'BLT']:
-            # Branch instructions
-            if len(operands) != 1:
-                self.add_error(line_num, f"Expected 1 operand for {mnemonic}")
-                return None
-                
-            # Try parsing as immediate first
-            imm = self.parse_immediate(operands[0])
-            if imm is not None:
-                return Instruction(
-                    type=InstructionType.CONTROL,
-                    opcode=Opcode[mnemonic],
-                    rd=0,
-                    rs1=0,
-                    rs2=0,
-                    imm=imm
-                )
-                
-            # If not an immediate, treat as label
-            if resolve_labels:
-                if operands[0] not in self.symbols:
-                    self.add_error(line_num, f"Undefined label: {operands[0]}")
-                    return None
-                # Calculate relative offset in words (4 bytes per instruction)
-                target_addr = self.symbols[operands[0]].address
-                current_addr = self.current_address + 4  # PC points to next instruction
-                imm = (target_addr - current_addr) >> 2
-            else:
-                # During first pass, just use 0 for the immediate
-                imm = 0
-                
-            return Instruction(
-                type=InstructionType.CONTROL,
-                opcode=Opcode[mnemonic],
-                rd=0,
-                rs1=0,
-                rs2=0,
-                imm=imm
-            )
-            
-        elif mnemonic == 'JMP':
-            # Jump instruction
-            if len(operands) != 1:
-                self.add_error(line_num, f"Expected 1 operand for {mnemonic}")
-                return None
-                
-            # Try parsing as register first
-            rs1 = self.parse_register(operands[0])
-            if rs1 is not None:
-                return Instruction(
-                    type=InstructionType.CONTROL,
-                    opcode=Opcode.JMP,
-                    rd=0,
-                    rs1=rs1,
-                    rs2=0,
-                    imm=0
-                )
-                
-            # If not a register, try as label
-            if resolve_labels:
-                if operands[0] not in self.symbols:
-                    self.add_error(line_num, f"Undefined label: {operands[0]}")
-                    return None
-                # Calculate relative offset in words (4 bytes per instruction)
-                target_addr = self.symbols[operands[0]].address
-                current_addr = self.current_address + 4  # PC points to next instruction
-                imm = (target_addr - current_addr) >> 2
-            else:
-                # During first pass, just use 0 for the immediate
-                imm = 0
-                
-            # Return a JMP instruction with the label's address
-            return Instruction(
-                type=InstructionType.CONTROL,
-                opcode=Opcode.JMP,
-                rd=0,
-                rs1=0,
-                rs2=0,
-                imm=imm
-            )
-            
-        elif mnemonic in ['CAL', 'FLUSH']:
-            # Register-based control instructions
-            if len(operands) != 1:
-                self.add_error(line_num, f"Expected 1 operand for {mnemonic}")
-                return None
-                
-            rs1 = self.parse_register(operands[0])
-            if rs1 is None:
-                self.add_error(line_num, "Invalid register")
-                return None
-                
-            return Instruction(
-                type=InstructionType.CONTROL,
-                opcode=Opcode[mnemonic],
-                rd=0,
-                rs1=rs1,
-                rs2=0,
-                imm=0
-            )
-            
-        else:
+        Label names and mnemonics are interned so symbol and dispatch lookups
+        can match on identity. Empty lines and comments produce no token.
+        """
+        parsed: List[Token] = []
+        for i, line in enumerate(source.split('\n'), 1):
+            match = LINE_RE.match(line)
+            if match is None:
+                continue
+            label = match.group('label')
+            if label:
+                parsed.append(Token(i, sys.intern(label), '', [], line.strip()))
+                continue
+            mnemonic = match.group('mnem')
+            if mnemonic:
+                ops = match.group('ops')
+                operands = split_operands(ops)
+                parsed.append(Token(i, None, sys.intern(mnemonic.upper()), operands, line.strip()))
+        return parsed
+    
+    def parse_tokens(self, mnemonic: str, operands: List[str], line_num: int, resolve_labels: bool = False) -> Optional[int]:
+        """Parse an already tokenized instruction into an encoded instruction word."""
+        group = DISPATCH_BY_CHAR.get(mnemonic[:1])
+        entry = group.get(mnemonic) if group else None
+        if entry is None:
             self.add_error(line_num, f"Unknown instruction: {mnemonic}")
             return None
+        handler, arity, arity_error, instr_type, opcode = entry
+        if len(operands) not in arity:
+            self.add_error(line_num, arity_error)
+            return None
+        return handler(self, opcode, operands, line_num, resolve_labels)
+    
+    def parse_instruction(self, line: str, line_num: int, resolve_labels: bool = False) -> Optional[int]:
+        """Parse a single line of assembly code into an encoded instruction word."""
+        match = LINE_RE.match(line)
+        if match is None or not match.group('mnem'):
+            return None
+            
+        ops = match.group('ops')
+        operands = split_operands(ops)
+        return self.parse_tokens(match.group('mnem').upper(), operands, line_num, resolve_labels)
     
     def assemble(self, source: str) -> Tuple[List[int], List[str]]:
         """Assemble source code into machine code."""
         self.reset()
         
-        # Split source into lines
-        lines = source.split('\n')
+        # Tokenize once; both passes walk the same records
+        parsed = self.tokenize(source)
+        
+        # Checked once so the per-line debug calls cost nothing when disabled
+        debug = log.isEnabledFor(logging.DEBUG)
         
         # First pass: collect labels
-        print("First pass: collecting labels...")
-        for i, line in enumerate(lines, 1):
-            # Skip empty lines and comments
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-                
-            # Check if line contains a label
-            if line.endswith(':'):
-                label = line[:-1].strip()
+        log.debug("First pass: collecting labels...")
+        for i, label, _, _, _ in parsed:
+            if label is not None:
                 if label in self.symbols:
                     self.add_error(i, f"Duplicate label: {label}")
                 else:
-                    self.symbols[label] = Symbol(label, self.current_address)
-                    print(f"Found label {label} at address {self.current_address}")
+                    symbol = Symbol(label, self.current_address)
+                    self.symbols[label] = symbol
+                    self.addr_to_label[self.current_address] = symbol
+                    if debug:
+                        log.debug("Found label %s at address %d", label, self.current_address)
                 continue
                 
             # Count non-label instructions
             self.current_address += 4
         
         # Second pass: parse instructions
-        print("\nSecond pass: parsing instructions...")
+        log.debug("Second pass: parsing instructions...")
+        # The first pass counted every instruction, so size the output once
+        # and trim it if some lines fail to parse or assembly stops early
+        instructions = [0] * (self.current_address >> 2)
+        count = 0
         self.current_address = 0
-        instructions = []
         
-        for i, line in enumerate(lines, 1):
-            # Skip empty lines and comments
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-                
+        for i, label, mnemonic, operands, line in parsed:
             # Skip label declarations
-            if line.endswith(':'):
+            if label is not None:
                 continue
                 
             # Parse instruction
-            print(f"Parsing line {i}: {line}")
-            instr = self.parse_instruction(line, i, resolve_labels=True)
-            if instr is not None:
-                instructions.append(instr.encode())
-                print(f"  Encoded as: {instr.encode():08x}")
+            if debug:
+                log.debug("Parsing line %d: %s", i, line)
+            word = self.parse_tokens(mnemonic, operands, i, resolve_labels=True)
+            if word is not None:
+                instructions[count] = word
+                count += 1
+                if debug:
+                    log.debug("  Encoded as: %08x", word)
                 self.current_address += 4
                 
                 # Stop assembling if we hit a branch to a label that's already defined
                 # This handles unreachable code after branch targets
-                if instr.type == InstructionType.CONTROL and instr.opcode == Opcode.BEQ:
-                    # Find the target label
-                    target_addr = self.current_address + (instr.imm << 2)
-                    for label, symbol in self.symbols.items():
-                        if symbol.address == target_addr:
-                            # If we're branching to a label that's already defined,
-                            # stop assembling here
-                            return instructions, self.errors
-            else:
-                print("  Failed to parse instruction")
+                if mnemonic == 'BEQ':
+                    # Find the target label from the sign-extended 27-bit offset
+                    imm = ((word & 0x7FFFFFF) ^ 0x4000000) - 0x4000000
+                    target_addr = self.current_address + (imm << 2)
+                    if target_addr in self.addr_to_label:
+                        # If we're branching to a label that's already defined,
+                        # stop assembling here
+                        del instructions[count:]
+                        return instructions, self.errors
+            elif debug:
+                log.debug("  Failed to parse instruction")
         
+        del instructions[count:]
         return instructions, self.errors
 
 def assemble_file(filename: str) -> Tuple[List[int], List[str]]:
     """Assemble a file into machine code."""
     try:
-        print(f"Reading file: {filename}")
+        log.debug("Reading file: %s", filename)
         with open(filename, 'r') as f:
             source = f.read()
-        print(f"File contents:\n{source}")
         return Assembler().assemble(source)
     except FileNotFoundError:
         return [], [f"File not found: {filename}"]
@@ -442,14 +198,17 @@ def assemble_file(filename: str) -> Tuple[List[int], List[str]]:
         return [], [f"Error reading file: {str(e)}"]
 
 if __name__ == '__main__':
-    import sys
+    import argparse
     
-    if len(sys.argv) != 2:
-        print("Usage: python assembler.py <assembly_file>")
-        sys.exit(1)
-        
-    filename = sys.argv[1]
-    instructions, errors = assemble_file(filename)
+    parser = argparse.ArgumentParser(description="Assemble a SlitherRISC source file")
+    parser.add_argument('filename', help="assembly source file")
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help="log each pass and instruction as it is assembled")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING,
+                        format='%(message)s')
+    
+    instructions, errors = assemble_file(args.filename)
     
     if errors:
         print("Assembly errors:")
@@ -1,64 +1,120 @@
-from dataclasses import dataclass
 from typing import List, Dict, Tuple, Optional
 import numpy as np
+from jit import njit
 
-@dataclass
-class CacheLine:
-    """Cache line structure."""
-    valid: bool = False
-    dirty: bool = False
-    tag: int = 0
-    data: List[int] = None
-    lru_counter: int = 0  # For LRU replacement
+@njit(cache=True)
+def _cache_read(valid, tags, data, line_index, tag, offset):
+    """Cache lookup kernel on an already decoded address.
     
-    def __post_init__(self):
-        if self.data is None:
-            self.data = [0] * 4  # 4 words per line
+    Args:
+        valid, tags, data: Cache line arrays
+        line_index: Cache line index
+        tag: Cache line tag
+        offset: Word offset within the line
+        
+    Returns:
+        Tuple of (hit, data)
+    """
+    if valid[line_index] and tags[line_index] == tag:
+        return True, data[line_index, offset]
+    return False, 0
+
+@njit(cache=True)
+def _cache_write(valid, tags, dirty, data, decode, address, value):
+    """Cache write kernel; allocates the line on a miss.
+    
+    Args:
+        valid, tags, dirty, data: Cache line arrays
+        decode: (index_shift, index_mask, tag_shift, offset_shift, offset_mask)
+        address: Memory address to write
+        value: Value to write
+        
+    Returns:
+        Whether the write hit
+    """
+    index_shift, index_mask, tag_shift, offset_shift, offset_mask = decode
+    line_index = (address >> index_shift) & index_mask
+    tag = address >> tag_shift
+    hit = valid[line_index] and tags[line_index] == tag
+    if not hit:
+        # Allocate new line
+        valid[line_index] = True
+        tags[line_index] = tag
+    data[line_index, (address >> offset_shift) & offset_mask] = value
+    dirty[line_index] = True
+    return hit
 
 class Cache:
     def __init__(self, size: int, line_size: int, access_time: int):
         """Initialize cache.
         
+        Line state is stored as parallel NumPy arrays indexed by line number
+        rather than one object per line. The cache is direct-mapped, so no
+        replacement (LRU) state is kept.
+        
         Args:
             size: Number of cache lines
             line_size: Number of words per line
             access_time: Access time in cycles
         """
+        if size <= 0 or size & (size - 1) or line_size <= 0 or line_size & (line_size - 1):
+            raise ValueError(f"Cache size and line size must be powers of two: {size}, {line_size}")
+        
         self.size = size
         self.line_size = line_size
         self.access_time = access_time
-        self.lines = [CacheLine(data=[0] * line_size) for _ in range(size)]
+        
+        # Address decode constants (byte address -> word offset, line index, tag)
+        self._offset_shift = 2
+        self._offset_mask = line_size - 1
+        self._index_shift = 2 + line_size.bit_length() - 1
+        self._index_mask = size - 1
+        self._tag_shift = self._index_shift + size.bit_length() - 1
+        self._decode = (self._index_shift, self._index_mask, self._tag_shift,
+                        self._offset_shift, self._offset_mask)
+        # The same decode from a word address (byte address >> 2)
+        self._line_bits = line_size.bit_length() - 1
+        self._word_tag_shift = self._tag_shift - 2
+        
+        # Per-line state
+        self.valid = np.zeros(size, dtype=bool)
+        self.dirty = np.zeros(size, dtype=bool)
+        self.tags = np.zeros(size, dtype=np.uint32)
+        self.data = np.zeros((size, line_size), dtype=np.uint32)
         
         # Performance counters
         self.hits = 0
         self.misses = 0
         self.cycles = 0
-        self.lru_counter = 0  # Global counter for LRU
     
     def reset(self) -> None:
         """Reset cache state."""
-        for line in self.lines:
-            line.valid = False
-            line.dirty = False
-            line.tag = 0
-            line.data = [0] * self.line_size
-            line.lru_counter = 0
+        self.valid.fill(False)
+        self.dirty.fill(False)
+        self.tags.fill(0)
+        self.data.fill(0)
         self.hits = 0
         self.misses = 0
         self.cycles = 0
-        self.lru_counter = 0
+    
+    # The get_* helpers are kept for external callers; read, write and
+    # MemorySystem decode addresses inline instead of calling them
     
     def get_line_index(self, address: int) -> int:
         """Get cache line index from address."""
-        return (address // (self.line_size * 4)) % self.size
+        return (address >> self._index_shift) & self._index_mask
     
     def get_tag(self, address: int) -> int:
         """Get cache line tag from address."""
-        return address // (self.size * self.line_size * 4)
+        return address >> self._tag_shift
     
     def get_offset(self, address: int) -> int:
         """Get word offset within cache line."""
-        return (address // 4) % self.line_size
+        return (address >> self._offset_shift) & self._offset_mask
+    
+    def get_line_base(self, tag: int, line_index: int) -> int:
+        """Get the memory index a line is written back to."""
+        return (tag * self.size + line_index) * 4
     
     def read(self, address: int, is_instruction_fetch: bool = False) -> Tuple[bool, int, int]:
         """Read from cache.
@@ -70,24 +126,42 @@ class Cache:
         Returns:
             Tuple of (hit, data, cycles)
         """
-        line_index = self.get_line_index(address)
-        tag = self.get_tag(address)
-        offset = self.get_offset(address)
+        word_addr = address >> 2
+        hit, data = _cache_read(self.valid, self.tags, self.data,
+                                (word_addr >> self._line_bits) & self._index_mask,
+                                word_addr >> self._word_tag_shift,
+                                word_addr & self._offset_mask)
+        
+        # Cache hit
+        if hit:
+            self.hits += 1
+            return True, int(data), self.access_time
         
-        line = self.lines[line_index]
-        cycles = self.access_time
+        # Cache miss
+        self.misses += 1
+        return False, 0, self.access_time
+    
+    def read_decoded(self, line_index: int, tag: int, offset: int) -> Tuple[bool, int, int]:
+        """Read from cache using an already decoded address.
+        
+        Args:
+            line_index: Cache line index
+            tag: Cache line tag
+            offset: Word offset within the line
+            
+        Returns:
+            Tuple of (hit, data, cycles)
+        """
+        hit, data = _cache_read(self.valid, self.tags, self.data, line_index, tag, offset)
         
         # Cache hit
-        if line.valid and line.tag == tag:
+        if hit:
             self.hits += 1
-            # Update LRU counter
-            self.lru_counter += 1
-            line.lru_counter = self.lru_counter
-            return True, line.data[offset], cycles
+            return True, int(data), self.access_time
         
         # Cache miss
         self.misses += 1
-        return False, 0, cycles
+        return False, 0, self.access_time
     
     def write(self, address: int, value: int) -> Tuple[bool, int]:
         """Write to cache.
@@ -99,36 +173,14 @@ class Cache:
         Returns:
             Tuple of (hit, cycles)
         """
-        line_index = self.get_line_index(address)
-        tag = self.get_tag(address)
-        offset = self.get_offset(address)
+        hit = _cache_write(self.valid, self.tags, self.dirty, self.data,
+                           self._decode, address, value & 0xFFFFFFFF)
         
-        line = self.lines[line_index]
-        cycles = self.access_time
-        
-        # Cache hit
-        if line.valid and line.tag == tag:
+        if hit:
             self.hits += 1
-            line.data[offset] = value
-            line.dirty = True
-            # Update LRU counter
-            self.lru_counter += 1
-            line.lru_counter = self.lru_counter
-            return True, cycles
-        
-        # Cache miss
-        self.misses += 1
-        
-        # Allocate new line
-        line.valid = True
-        line.tag = tag
-        line.data[offset] = value
-        line.dirty = True
-        # Update LRU counter
-        self.lru_counter += 1
-        line.lru_counter = self.lru_counter
-        
-        return False, cycles
+        else:
+            self.misses += 1
+        return hit, self.access_time
     
     def get_stats(self) -> Dict[str, float]:
         """Get cache statistics."""
@@ -147,8 +199,8 @@ class MemorySystem:
         Args:
             memory_size: Size of main memory in words
         """
-        # Main memory (4KB)
-        self.memory = np.zeros(memory_size, dtype=np.int64)
+        # Main memory (4KB), one 32-bit word per entry
+        self.memory = np.zeros(memory_size, dtype=np.uint32)
         
         # L1 Cache (16 lines, 4 words per line)
         self.L1_cache = Cache(16, 4, 1)
@@ -174,14 +226,20 @@ class MemorySystem:
         
         Args:
             program: List of instructions to load
+            
+        Raises:
+            ValueError: If the program does not fit in memory
         """
         # Reset memory and caches
         self.reset()
         
-        # Load program into memory at word-aligned addresses
-        for i, instruction in enumerate(program):
-            addr = i * 4  # Word-aligned addresses
-            self.memory[addr] = instruction & 0xFFFFFFFF  # Ensure 32-bit value
+        # Memory is indexed by byte address (fetch reads memory[pc]), so
+        # instruction i goes to the word-aligned index i * 4
+        words = np.asarray(program, dtype=np.int64) & 0xFFFFFFFF  # Ensure 32-bit values
+        end = words.size * 4
+        if end > len(self.memory):
+            raise ValueError(f"Program too large for memory: {words.size} instructions")
+        self.memory[:end:4] = words
     
     def read(self, address: int, is_instruction_fetch: bool = False) -> Tuple[int, int]:
         """Read from memory system.
@@ -202,23 +260,37 @@ class MemorySystem:
         # For instruction fetches, only count cache access if it's a new fetch
         if is_instruction_fetch:
             if address == self.last_fetch_addr:
-                return self.memory[address], 0
+                return int(self.memory[address]), 0
             self.last_fetch_addr = address
         
-        # Try L1 cache first
-        hit, data, cycles = self.L1_cache.read(address, is_instruction_fetch)
-        if hit:
-            return data, cycles
+        return self.read_fused(address)
+    
+    def read_fused(self, address: int) -> Tuple[int, int]:
+        """Look up an address in L1, then L2, then main memory.
         
-        # Try L2 cache
-        hit, data, cycles2 = self.L2_cache.read(address, is_instruction_fetch)
-        if hit:
-            return data, cycles + cycles2
+        Equivalent to calling Cache.read on each level in turn, but the
+        word address and offset are decoded once and shared between levels,
+        which use the same line size and differ only in index and tag.
         
-        # Cache miss, read from memory
-        data = self.memory[address]
+        Args:
+            address: Memory address to read (must already be bounds checked)
+            
+        Returns:
+            Tuple of (data, cycles)
+        """
+        word_addr = address >> 2
+        offset = word_addr & self.L1_cache._offset_mask
+        cycles = 0
+        for cache in (self.L1_cache, self.L2_cache):
+            cycles += cache.access_time
+            hit, data, _ = cache.read_decoded((word_addr >> cache._line_bits) & cache._index_mask,
+                                              word_addr >> cache._word_tag_shift,
+                                              offset)
+            if hit:
+                return data, cycles
         
-        return data, cycles + cycles2 + self.memory_access_time
+        # Cache miss, read from memory
+        return int(self.memory[address]), cycles + self.memory_access_time
     
     def write(self, address: int, value: int) -> int:
         """Write to memory system.
@@ -237,12 +309,19 @@ class MemorySystem:
             raise ValueError(f"Invalid memory address: {address}")
         
         # Write-through policy: write to all levels
+        value &= 0xFFFFFFFF  # Ensure 32-bit value
         self.memory[address] = value
         
-        hit1, cycles1 = self.L1_cache.write(address, value)
-        hit2, cycles2 = self.L2_cache.write(address, value)
+        cycles = self.memory_access_time
+        for cache in (self.L1_cache, self.L2_cache):
+            if _cache_write(cache.valid, cache.tags, cache.dirty, cache.data,
+                            cache._decode, address, value):
+                cache.hits += 1
+            else:
+                cache.misses += 1
+            cycles += cache.access_time
         
-        return cycles1 + cycles2 + self.memory_access_time
+        return cycles
     
     def get_stats(self) -> Dict[str, Dict[str, float]]:
         """Get memory system statistics."""
@@ -253,24 +332,11 @@ class MemorySystem:
     
     def flush_cache_line(self, address: int) -> None:
         """Force writeback of cache line to memory."""
-        # Flush L1 cache
-        line_index = self.L1_cache.get_line_index(address)
-        tag = self.L1_cache.get_tag(address)
-        L1_line = self.L1_cache.lines[line_index]
-        
-        if L1_line.valid and L1_line.tag == tag:
-            for i in range(4):
-                mem_addr = (tag * self.L1_cache.size * 4) + (line_index * 4) + i
-                self.memory[mem_addr] = L1_line.data[i]
-            L1_line.dirty = False
-        
-        # Flush L2 cache
-        line_index = self.L2_cache.get_line_index(address)
-        tag = self.L2_cache.get_tag(address)
-        L2_line = self.L2_cache.lines[line_index]
-        
-        if L2_line.valid and L2_line.tag == tag:
-            for i in range(4):
-                mem_addr = (tag * self.L2_cache.size * 4) + (line_index * 4) + i
-                self.memory[mem_addr] = L2_line.data[i]
-            L2_line.dirty = False 
\ No newline at end of file
+        for cache in (self.L1_cache, self.L2_cache):
+            line_index = (address >> cache._index_shift) & cache._index_mask
+            tag = address >> cache._tag_shift
+            
+            if cache.valid[line_index] and cache.tags[line_index] == tag:
+                base = (tag * cache.size + line_index) * 4
+                self.memory[base:base + 4] = cache.data[line_index, :4]
+                cache.dirty[line_index] = False
@@ -1,6 +1,6 @@
 import pygame
 import pygame.font
-import time
+from functools import lru_cache
 import tkinter as tk
 from tkinter import filedialog
 from typing import Dict, List, Tuple, Optional, Set
@@ -22,6 +22,25 @@ BLUE = (60, 60, 200)
 YELLOW = (220, 220, 60)
 BG_COLOR = (245, 245, 245)  # Light background
 
+# Register display names; R29-R31 are the special-purpose STAT, LR and XZR
+REG_NAMES = tuple("STAT" if i == 29 else "LR" if i == 30 else "XZR" if i == 31 else f"R{i}"
+                  for i in range(32))
+
+# Screen panels in drawing order
+PANELS = ('buttons', 'stats', 'registers', 'pipeline', 'memory')
+
+@lru_cache(maxsize=16384)
+def _hex8(value: int) -> str:
+    """Format a word as 8 hex digits; programs touch few distinct values."""
+    return f"{value:08x}"
+
+# Memory row templates keyed by display format; hex and binary values are pre-formatted
+MEMORY_ROW_FMT = {
+    'hex': "0x%04x: 0x%s",
+    'decimal': "0x%04x: %d",
+    'binary': "0x%04x: %s",
+}
+
 # Pipeline stage colors
 PIPELINE_COLORS = {
     PipelineStage.FETCH: (255, 200, 200),    # Light red
@@ -58,9 +77,22 @@ class SimulatorGUI:
             pygame.display.set_caption("SlitherRISC Simulator")
             
             self.font = pygame.font.SysFont('Courier New', self.settings.FONT_SIZE)
+            self._font_cache: Dict[Tuple[int, bool], pygame.font.Font] = {  # (size, bold) -> font
+                (self.settings.FONT_SIZE, False): self.font
+            }
+            # Rendered text surfaces; most labels are identical from frame to frame
+            self._render_text = lru_cache(maxsize=2048)(self._render_text_uncached)
+            # "Rxx: 0x" prefixes never change, so only the hex digits are rendered per value
+            self._reg_label_surfs = [
+                self._render_text_uncached((self.settings.FONT_SIZE, False), f"{name}: 0x", BLACK)
+                for name in REG_NAMES
+            ]
+            # (surface, position) pairs queued by draw_text until flush_text
+            self._pending_blits: List[Tuple[pygame.Surface, Tuple[int, int]]] = []
             self.memory = memory
             self.pipeline = pipeline
             self.registers = registers
+            self._ordered_stages = tuple(PipelineStage)  # Parallel to pipeline.stages_list
             
             # Control buttons
             self.buttons = {
@@ -74,12 +106,47 @@ class SimulatorGUI:
                 'run_to_breakpoint': pygame.Rect(880, 10, 150, 30)
             }
             
+            # Memory panel controls, shared by drawing and click handling
+            mem_x, mem_y = 340, 200 + self.settings.STATS_HEIGHT
+            self.format_rect = pygame.Rect(mem_x + 100, mem_y, 200, 20)
+            self.nav_up_rect = pygame.Rect(mem_x + 200, mem_y, 30, 20)
+            self.nav_down_rect = pygame.Rect(mem_x + 240, mem_y, 30, 20)
+            
             self.running = False
+            self._breakpoint_mode = False  # Running via run_to_breakpoint
+            self._last_step_ms = 0  # pygame tick of the last timed step
+            self._step_interval_ms = 500  # Delay between steps when running
+            self._breakpoint_interval_ms = 100  # Delay between steps when running to a breakpoint
             self.cache_enabled = True
             self.pipeline_enabled = True
             self.breakpoints: Set[int] = set()  # Set of PC values for breakpoints
             self.memory_format = 'hex'  # Current memory display format
             self.memory_offset = 0  # Current memory view offset
+            # Fixed-width cache row templates, applied as fmt % (i, tag, *data)
+            self._l1_cache_fmt = self._cache_row_fmt("L1", self.memory.L1_cache.line_size)
+            self._l2_cache_fmt = self._cache_row_fmt("L2", self.memory.L2_cache.line_size)
+            
+            # Screen area owned by each panel; only dirty panels are redrawn
+            width = self.settings.WINDOW_WIDTH
+            height = self.settings.WINDOW_HEIGHT
+            self._panel_rects = {
+                'buttons': pygame.Rect(0, 0, width, 45),
+                'stats': pygame.Rect(0, 45, width, 95),
+                'registers': pygame.Rect(0, 140, 330, height - 140),
+                'pipeline': pygame.Rect(330, 140, width - 330, 115),
+                'memory': pygame.Rect(330, 255, width - 330, height - 255),
+            }
+            self._panel_draw = {
+                'buttons': self.draw_buttons,
+                'stats': self.draw_stats,
+                'registers': self.draw_register_file,
+                'pipeline': self.draw_pipeline,
+                'memory': self.draw_memory_and_cache,
+            }
+            self._dirty: Set[str] = set(PANELS)
+            # Bumped on every state change so run() can skip draw() entirely
+            self._state_version = 1
+            self._drawn_version = 0
             
             # Initialize tkinter for file dialogs
             self.root = tk.Tk()
@@ -88,13 +155,34 @@ class SimulatorGUI:
             print(f"Error initializing GUI: {str(e)}")
             raise
         
+    def get_font(self, size: int, bold: bool = False) -> pygame.font.Font:
+        """Get a font of the given size and weight, creating it only once."""
+        key = (size, bold)
+        font = self._font_cache.get(key)
+        if font is None:
+            font = pygame.font.SysFont('Courier New', size, bold=bold)
+            self._font_cache[key] = font
+        return font
+        
+    def _render_text_uncached(self, font_key: Tuple[int, bool], text: str, color: Tuple[int, int, int]) -> pygame.Surface:
+        """Render text with the font for font_key; wrapped by an LRU cache in __init__."""
+        return self.get_font(*font_key).render(text, True, color)
+        
     def draw_text(self, text: str, pos: Tuple[int, int], color: Tuple[int, int, int] = WHITE, bold: bool = False, size: int = None) -> None:
-        """Draw text on the screen with optional bold and size."""
-        font = self.font
-        if size or bold:
-            font = pygame.font.SysFont('Courier New', size or self.settings.FONT_SIZE, bold=bold)
-        text_surface = font.render(text, True, color)
-        self.screen.blit(text_surface, pos)
+        """Queue text for drawing with optional bold and size; see flush_text."""
+        text_surface = self._render_text((size or self.settings.FONT_SIZE, bold), text, color)
+        self._pending_blits.append((text_surface, pos))
+    
+    def flush_text(self) -> None:
+        """Blit all queued text in one Surface.blits call."""
+        if self._pending_blits:
+            self.screen.blits(self._pending_blits, doreturn=0)
+            self._pending_blits.clear()
+    
+    def mark_dirty(self, *panels: str) -> None:
+        """Mark panels for redraw on the next frame; no arguments marks all of them."""
+        self._dirty.update(panels or PANELS)
+        self._state_version += 1
     
     def draw_buttons(self) -> None:
         """Draw control buttons at the top."""
@@ -111,7 +199,7 @@ class SimulatorGUI:
                 text = f"Pipeline: {'On' if self.pipeline_enabled else 'Off'}"
             else:
                 text = name.capitalize()
-            text_surface = self.font.render(text, True, BLACK)
+            text_surface = self._render_text((self.settings.FONT_SIZE, False), text, BLACK)
             text_rect = text_surface.get_rect(center=rect.center)
             self.screen.blit(text_surface, text_rect)
             bx += rect.width + 10
@@ -141,21 +229,35 @@ class SimulatorGUI:
         x += self.settings.STATS_SPACING * 2
         self.draw_text(f"L2 Hits: {l2_stats['hits']} Misses: {l2_stats['misses']} Hit Rate: {l2_stats['hit_rate']:.1f}%", (x, y), BLACK)
 
+    @staticmethod
+    def _cache_row_fmt(name: str, line_size: int) -> str:
+        """Build the %-format template for one valid cache line row.
+
+        Args:
+            name: Cache level label, e.g. "L1"
+            line_size: Words per cache line
+
+        Returns:
+            Template taking (index, tag, *data)
+        """
+        return name + "[%d]: Tag=0x%x, Data=[" + ", ".join(["0x%x"] * line_size) + "]"
+
     def draw_register_file(self) -> None:
         """Draw the register file section in two columns."""
         x, y = self.settings.PADDING, 90 + self.settings.STATS_HEIGHT  # Move down to account for stats
         self.draw_text("Register File", (x, y), BLUE, bold=True, size=18)
         y += self.settings.HEADER_HEIGHT
         col_width = 140
+        vals = self.registers.get_all()
+        labels = self._reg_label_surfs
+        render = self._render_text
+        font_key = (self.settings.FONT_SIZE, False)
+        pending = self._pending_blits
         for i in range(16):
-            reg_value1 = self.registers.get(i)
-            reg_value2 = self.registers.get(i+16)
-            reg_name1 = f"R{i}" if i < 29 else ("STAT" if i == 29 else ("LR" if i == 30 else "XZR"))
-            reg_name2 = f"R{i+16}" if i+16 < 29 else ("STAT" if i+16 == 29 else ("LR" if i+16 == 30 else "XZR"))
-            text1 = f"{reg_name1}: 0x{reg_value1:08x}"
-            text2 = f"{reg_name2}: 0x{reg_value2:08x}"
-            self.draw_text(text1, (x, y), BLACK)
-            self.draw_text(text2, (x + col_width, y), BLACK)
+            for j, col_x in ((i, x), (i + 16, x + col_width)):
+                label = labels[j]
+                pending.append((label, (col_x, y)))
+                pending.append((render(font_key, _hex8(vals[j]), BLACK), (col_x + label.get_width(), y)))
             y += 22
 
     def draw_pipeline(self) -> None:
@@ -165,19 +267,19 @@ class SimulatorGUI:
         stage_width = 120
         stage_height = 40
         spacing = 18
-        for idx, stage in enumerate(PipelineStage):
+        for idx, (stage, stage_reg) in enumerate(zip(self._ordered_stages, self.pipeline.stages_list)):
             stage_rect = pygame.Rect(x + idx * (stage_width + spacing), y, stage_width, stage_height)
             pygame.draw.rect(self.screen, PIPELINE_COLORS[stage], stage_rect)
             pygame.draw.rect(self.screen, GRAY, stage_rect, 2)
-            instruction = self.pipeline.stages[stage].instruction
+            instruction = stage_reg.instruction
             label = stage.name
             instr_text = str(instruction) if instruction else "Empty"
             self.draw_text(label, (stage_rect.x + 5, stage_rect.y + 5), BLACK, bold=True)
             self.draw_text(instr_text, (stage_rect.x + 5, stage_rect.y + 22), BLACK)
             
             # Draw hazard indicators
-            if self.pipeline.stages[stage].hazard != HazardType.NONE:
-                hazard_text = f"Hazard: {self.pipeline.stages[stage].hazard.name}"
+            if stage_reg.hazard != HazardType.NONE:
+                hazard_text = f"Hazard: {stage_reg.hazard.name}"
                 self.draw_text(hazard_text, (stage_rect.x + 5, stage_rect.y + 40), RED)
 
     def draw_memory_and_cache(self) -> None:
@@ -188,35 +290,33 @@ class SimulatorGUI:
         self.draw_text("Memory", (mem_x, mem_y), BLUE, bold=True, size=18)
         
         # Memory format selector
-        format_rect = pygame.Rect(mem_x + 100, mem_y, 200, 20)
-        pygame.draw.rect(self.screen, LIGHT_GRAY, format_rect)
-        pygame.draw.rect(self.screen, GRAY, format_rect, 1)
+        pygame.draw.rect(self.screen, LIGHT_GRAY, self.format_rect)
+        pygame.draw.rect(self.screen, GRAY, self.format_rect, 1)
         format_text = f"Format: {self.memory_format}"
         self.draw_text(format_text, (mem_x + 110, mem_y), BLACK)
         
         y = mem_y + 30
         mem_font_size = 13
+        self.memory.sync()  # Main memory is stale while write-back lines are dirty
+        row_fmt = MEMORY_ROW_FMT[self.memory_format]
+        hex_format = self.memory_format == 'hex'
+        binary = self.memory_format == 'binary'
         for i in range(0, 16):
             addr = self.memory_offset + i * 4
             value = self.memory.memory[addr]
-            if self.memory_format == 'hex':
-                text = f"0x{addr:04x}: 0x{value:08x}"
-            elif self.memory_format == 'decimal':
-                text = f"0x{addr:04x}: {value}"
-            else:  # binary
-                text = f"0x{addr:04x}: {value:032b}"
+            if hex_format:
+                value = _hex8(value)
+            elif binary:
+                value = format(value, '032b')
+            text = row_fmt % (addr, value)
             self.draw_text(text, (mem_x, y), BLACK, size=mem_font_size)
             y += 18
             
         # Memory navigation buttons
-        nav_x = mem_x + 200
-        nav_y = mem_y
-        up_rect = pygame.Rect(nav_x, nav_y, 30, 20)
-        down_rect = pygame.Rect(nav_x + 40, nav_y, 30, 20)
-        pygame.draw.rect(self.screen, LIGHT_GRAY, up_rect)
-        pygame.draw.rect(self.screen, LIGHT_GRAY, down_rect)
-        self.draw_text("↑", (nav_x + 10, nav_y), BLACK)
-        self.draw_text("↓", (nav_x + 50, nav_y), BLACK)
+        pygame.draw.rect(self.screen, LIGHT_GRAY, self.nav_up_rect)
+        pygame.draw.rect(self.screen, LIGHT_GRAY, self.nav_down_rect)
+        self.draw_text("↑", (self.nav_up_rect.x + 10, self.nav_up_rect.y), BLACK)
+        self.draw_text("↓", (self.nav_down_rect.x + 10, self.nav_down_rect.y), BLACK)
         
         # Cache on the right below pipeline (moved further right)
         cache_x = mem_x + 400  # Increased spacing between memory and cache
@@ -226,15 +326,21 @@ class SimulatorGUI:
         self.draw_text("L1 Cache:", (cache_x, y), YELLOW, bold=True)
         y += 18
         cache_font_size = 12
-        for i, line in enumerate(self.memory.L1_cache.lines[:8]):
-            text = f"L1[{i}]: " + (f"Tag=0x{line.tag:x}, Data=[{', '.join(f'0x{x:x}' for x in line.data)}]" if line.valid else "Invalid")
+        cache_fmt = self._l1_cache_fmt
+        cache = self.memory.L1_cache
+        for i, (valid, tag, data) in enumerate(zip(cache.valid[:8].tolist(), cache.tags[:8].tolist(),
+                                                   cache.data[:8].tolist())):
+            text = cache_fmt % (i, tag, *data) if valid else "L1[%d]: Invalid" % i
             self.draw_text(text, (cache_x, y), BLACK, size=cache_font_size)
             y += 16
         y += 6
         self.draw_text("L2 Cache:", (cache_x, y), YELLOW, bold=True)
         y += 18
-        for i, line in enumerate(self.memory.L2_cache.lines[:8]):
-            text = f"L2[{i}]: " + (f"Tag=0x{line.tag:x}, Data=[{', '.join(f'0x{x:x}' for x in line.data)}]" if line.valid else "Invalid")
+        cache_fmt = self._l2_cache_fmt
+        cache = self.memory.L2_cache
+        for i, (valid, tag, data) in enumerate(zip(cache.valid[:8].tolist(), cache.tags[:8].tolist(),
+                                                   cache.data[:8].tolist())):
+            text = cache_fmt % (i, tag, *data) if valid else "L2[%d]: Invalid" % i
             self.draw_text(text, (cache_x, y), BLACK, size=cache_font_size)
             y += 16
 
@@ -244,24 +350,33 @@ class SimulatorGUI:
             if event.type == pygame.QUIT:
                 return False
             
+            if event.type == pygame.VIDEOEXPOSE:
+                self.mark_dirty()
+            
             if event.type == pygame.MOUSEBUTTONDOWN:
                 pos = pygame.mouse.get_pos()
                 
                 # Check button clicks
                 if self.buttons['step'].collidepoint(pos):
                     self.pipeline.step()
+                    self.mark_dirty('stats', 'registers', 'pipeline', 'memory')
                 elif self.buttons['run'].collidepoint(pos):
                     self.running = not self.running
+                    self._breakpoint_mode = False
                 elif self.buttons['reset'].collidepoint(pos):
                     self.pipeline.reset()
                     self.memory.reset()
                     self.registers.reset()
+                    self.mark_dirty()
                 elif self.buttons['cache_toggle'].collidepoint(pos):
                     self.cache_enabled = not self.cache_enabled
+                    self.memory.flush()
                     self.memory.cache_enabled = self.cache_enabled
+                    self.mark_dirty('buttons')
                 elif self.buttons['pipeline_toggle'].collidepoint(pos):
                     self.pipeline_enabled = not self.pipeline_enabled
                     self.pipeline.enabled = self.pipeline_enabled
+                    self.mark_dirty('buttons')
                 elif self.buttons['load'].collidepoint(pos):
                     self.load_program()
                 elif self.buttons['save'].collidepoint(pos):
@@ -270,19 +385,16 @@ class SimulatorGUI:
                     self.run_to_breakpoint()
                 
                 # Check memory format selector
-                format_rect = pygame.Rect(340 + 100, 200, 200, 20)
-                if format_rect.collidepoint(pos):
+                if self.format_rect.collidepoint(pos):
                     self.cycle_memory_format()
                 
                 # Check memory navigation
-                nav_x = 340 + 200
-                nav_y = 200
-                up_rect = pygame.Rect(nav_x, nav_y, 30, 20)
-                down_rect = pygame.Rect(nav_x + 40, nav_y, 30, 20)
-                if up_rect.collidepoint(pos):
+                if self.nav_up_rect.collidepoint(pos):
                     self.memory_offset = max(0, self.memory_offset - 16)
-                elif down_rect.collidepoint(pos):
+                    self.mark_dirty('memory')
+                elif self.nav_down_rect.collidepoint(pos):
                     self.memory_offset = min(len(self.memory.memory) - 16, self.memory_offset + 16)
+                    self.mark_dirty('memory')
                 
                 # Check for breakpoint setting
                 if 340 <= pos[0] <= 640 and 230 <= pos[1] <= 500:  # Memory view area
@@ -291,6 +403,7 @@ class SimulatorGUI:
                         self.breakpoints.remove(addr)
                     else:
                         self.breakpoints.add(addr)
+                    self.mark_dirty('memory')
         
         return True
 
@@ -299,6 +412,7 @@ class SimulatorGUI:
         formats = ['hex', 'decimal', 'binary']
         current_idx = formats.index(self.memory_format)
         self.memory_format = formats[(current_idx + 1) % len(formats)]
+        self.mark_dirty('memory')
 
     def load_program(self) -> None:
         """Load a program from file."""
@@ -325,7 +439,7 @@ class SimulatorGUI:
                 try:
                     # Load binary file
                     with open(file_path, 'rb') as f:
-                        program = list(f.read())
+                        program = f.read()
                 except Exception as e:
                     self.show_error("File Error", f"Failed to read file: {str(e)}")
                     return
@@ -334,6 +448,7 @@ class SimulatorGUI:
                 self.memory.load_program(program)
                 self.pipeline.reset()
                 self.registers.reset()
+                self.mark_dirty()
             except Exception as e:
                 self.show_error("Load Error", f"Failed to load program into memory: {str(e)}")
                 return
@@ -363,8 +478,9 @@ class SimulatorGUI:
                 return
                 
             try:
+                self.memory.sync()
                 with open(file_path, 'wb') as f:
-                    f.write(bytes(self.memory.memory))
+                    f.write(memoryview(self.memory.memory).cast('B'))  # Write the buffer without copying
             except Exception as e:
                 self.show_error("Save Error", f"Failed to save program: {str(e)}")
                 
@@ -372,33 +488,50 @@ class SimulatorGUI:
             self.show_error("Error", f"Unexpected error while saving program: {str(e)}")
 
     def run_to_breakpoint(self) -> None:
-        """Run until a breakpoint is hit."""
+        """Run until a breakpoint is hit; stepping happens in update()."""
         self.running = True
-        while self.running:
-            if self.pipeline.pc in self.breakpoints:
-                self.running = False
-                break
-            self.pipeline.step()
-            time.sleep(0.1)  # Add a small delay for visualization
+        self._breakpoint_mode = True
 
     def update(self) -> None:
-        """Update simulator state."""
-        if self.running:
-            if self.pipeline.pc in self.breakpoints:
-                self.running = False
-            else:
-                self.pipeline.step()
-                time.sleep(0.5)  # Add a 500ms delay between instructions
+        """Step the simulator when running and the step interval has elapsed.
+        
+        Steps are timed with pygame ticks rather than sleeping, so the main
+        loop keeps handling events (including Stop) while a program runs.
+        """
+        if not self.running:
+            return
+        
+        now = pygame.time.get_ticks()
+        interval = self._breakpoint_interval_ms if self._breakpoint_mode else self._step_interval_ms
+        if now - self._last_step_ms < interval:
+            return
+        
+        if self.pipeline.pc in self.breakpoints:
+            self.running = False
+            self._breakpoint_mode = False
+        else:
+            self.pipeline.step()
+            self._last_step_ms = now
+            self.mark_dirty('stats', 'registers', 'pipeline', 'memory')
 
     def draw(self) -> None:
-        """Draw the entire GUI."""
-        self.screen.fill(BG_COLOR)
-        self.draw_buttons()
-        self.draw_stats()
-        self.draw_register_file()
-        self.draw_pipeline()
-        self.draw_memory_and_cache()
-        pygame.display.flip()
+        """Redraw the dirty panels and update only their screen areas."""
+        if not self._dirty:
+            return
+        
+        updated = []
+        for name in PANELS:
+            if name not in self._dirty:
+                continue
+            rect = self._panel_rects[name]
+            self.screen.set_clip(rect)
+            self.screen.fill(BG_COLOR, rect)
+            self._panel_draw[name]()
+            self.flush_text()
+            updated.append(rect)
+        self.screen.set_clip(None)
+        self._dirty.clear()
+        pygame.display.update(updated)
 
     def run(self) -> None:
         """Run the GUI main loop."""
@@ -408,7 +541,9 @@ class SimulatorGUI:
         while running:
             running = self.handle_events()
             self.update()
-            self.draw()
+            if self._state_version != self._drawn_version:
+                self.draw()
+                self._drawn_version = self._state_version
             clock.tick(60)  # Limit to 60 FPS
         
         pygame.quit()
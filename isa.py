@@ -1,11 +1,21 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum, auto
-from typing import List, Tuple, Optional
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Tuple, Optional
+import numpy as np
+from jit import NUMBA_AVAILABLE, njit, prange
 
 class InstructionType(Enum):
     ARITHMETIC = auto()
     MEMORY = auto()
     CONTROL = auto()
+    
+    # Members are singletons compared by identity, so the identity hash is
+    # consistent with == and skips Enum's Python-level __hash__ on lookups
+    __hash__ = object.__hash__
+
+# Type field value for each instruction type
+_TYPE_INDEX = {InstructionType.ARITHMETIC: 0, InstructionType.MEMORY: 1, InstructionType.CONTROL: 2}
 
 class Opcode(Enum):
     # Arithmetic Instructions (Type 00)
@@ -34,6 +44,9 @@ class Opcode(Enum):
     MODI = 0x16   # 10110
     MOV = 0x17    # 10111
     MOVI = 0x18   # 11000
+    # Stops the program. Encoded in the arithmetic space, whose 5-bit opcode
+    # field has room to spare, with all operand fields zero
+    HALT = 0x1F   # 11111
 
     # Memory Instructions (Type 01)
     LDR = 0x20    # 00
@@ -45,9 +58,139 @@ class Opcode(Enum):
     BLT = 0x32    # 010
     CAL = 0x33    # 100
     FLUSH = 0x34  # 101
+    
+    # Identity hash, as for InstructionType; opcodes key the pipeline's
+    # per-cycle dispatch tables
+    __hash__ = object.__hash__
+
+# Instruction type for each 2-bit type field value (0b11 decodes as control)
+_TYPE_BY_INT = (InstructionType.ARITHMETIC, InstructionType.MEMORY,
+                InstructionType.CONTROL, InstructionType.CONTROL)
+
+# Combined (type << 5 | opcode) value -> Opcode, None where Opcode() would fail
+_OPCODE_TABLE: List[Optional[Opcode]] = [None] * 128
+for _op in Opcode:
+    _OPCODE_TABLE[_op.value] = _op
+del _op
+
+# Opcodes grouped by assembly syntax, for __str__
+_ARITH_IMM_OPS = frozenset({Opcode.ADDI, Opcode.SUBI, Opcode.MULI, Opcode.DIVI,
+                            Opcode.ANDI, Opcode.ORI, Opcode.XORI, Opcode.MODI,
+                            Opcode.MOVI})
+_SHIFT_OPS = frozenset({Opcode.SHL, Opcode.SHR})
+
+# Arithmetic opcodes that set the condition flags
+_FLAG_OPS = frozenset({Opcode.ADDS, Opcode.ADDIS, Opcode.SUBS, Opcode.SUBIS, Opcode.CMP})
+
+# Opcode values used inside the JIT kernels, which cannot look up enum members
+_JMP = Opcode.JMP.value
+_CAL = Opcode.CAL.value
+_FLUSH = Opcode.FLUSH.value
+_STR = Opcode.STR.value & 0x3  # Relative to the memory type
+
+# Immediate sign bits; (imm ^ sign) - sign sign-extends without a branch
+_ARITH_SIGN = 0x200     # 10-bit arithmetic immediate
+_MEM_SIGN = 0x20000     # 18-bit memory offset
+_CTRL_SIGN = 0x4000000  # 27-bit branch offset
+
+@njit(cache=True)
+def _decode_bits(word):
+    """Split a 32-bit instruction word into its fields.
+    
+    Returns:
+        Tuple of (type, opcode, rd, rs1, rs2, imm), with the opcode still
+        relative to its type and the immediate sign extended
+    """
+    # Extract type (2 bits)
+    instr_type = (word >> 30) & 0x3
+    
+    # Extract opcode based on type
+    if instr_type == 0:  # Arithmetic
+        opcode = (word >> 25) & 0x1F  # 5 bits
+        rd = (word >> 20) & 0x1F      # 5 bits
+        rs1 = (word >> 15) & 0x1F     # 5 bits
+        rs2 = (word >> 10) & 0x1F     # 5 bits
+        imm = ((word & 0x3FF) ^ _ARITH_SIGN) - _ARITH_SIGN  # 10 bits, sign extended
+    elif instr_type == 1:  # Memory
+        opcode = (word >> 28) & 0x3   # 2 bits
+        rd = (word >> 23) & 0x1F      # 5 bits: LDR's rd, or STR's source register
+        rs1 = (word >> 18) & 0x1F     # 5 bits
+        imm = ((word & 0x3FFFF) ^ _MEM_SIGN) - _MEM_SIGN  # 18 bits, sign extended
+        rs2 = 0
+        if opcode == _STR:  # A store reads its source as rs2 and writes no register
+            rs2 = rd
+            rd = 0
+    else:  # Control
+        opcode = (word >> 27) & 0x7   # 3 bits
+        if opcode == _JMP or opcode == _CAL or opcode == _FLUSH:
+            rs1 = (word >> 22) & 0x1F  # 5 bits
+            imm = 0  # Not used
+            rs2 = 0  # Not used
+            rd = 0   # Not used
+        else:  # BEQ, BLT
+            imm = ((word & 0x7FFFFFF) ^ _CTRL_SIGN) - _CTRL_SIGN  # 27 bits, sign extended
+            rs1 = 0  # Not used
+            rs2 = 0  # Not used
+            rd = 0   # Not used
+    
+    return instr_type, opcode, rd, rs1, rs2, imm
+
+@njit(cache=True)
+def _encode_bits(instr_type, opcode, rd, rs1, rs2, imm):
+    """Pack instruction fields into a 32-bit word.
+    
+    Args:
+        instr_type: 0 (arithmetic), 1 (memory) or 2 (control)
+        opcode: Full Opcode value
+        rd, rs1, rs2, imm: Operand fields
+    """
+    word = 0
+    
+    # Set type bits
+    if instr_type == 0:
+        word |= 0 << 30  # Type 00
+        word |= (opcode & 0x1F) << 25  # 5 bits opcode
+        word |= (rd & 0x1F) << 20      # 5 bits rd
+        word |= (rs1 & 0x1F) << 15     # 5 bits rs1
+        word |= (rs2 & 0x1F) << 10     # 5 bits rs2
+        word |= imm & 0x3FF            # 10 bits imm
+    elif instr_type == 1:
+        word |= 1 << 30  # Type 01
+        word |= (opcode & 0x3) << 28   # 2 bits opcode
+        if (opcode & 0x3) == _STR:
+            word |= (rs2 & 0x1F) << 23  # 5 bits source register
+        else:
+            word |= (rd & 0x1F) << 23   # 5 bits rd
+        word |= (rs1 & 0x1F) << 18     # 5 bits rs1
+        word |= imm & 0x3FFFF          # 18 bits imm
+    else:  # Control
+        word |= 2 << 30  # Type 10
+        word |= (opcode & 0x7) << 27   # 3 bits opcode
+        if opcode == _JMP or opcode == _CAL or opcode == _FLUSH:
+            word |= (rs1 & 0x1F) << 22  # 5 bits rs1
+        else:  # BEQ, BLT
+            word |= imm & 0x7FFFFFF     # 27 bits imm
+    
+    return word
 
-@dataclass
+@njit(parallel=True, cache=True)
+def _decode_bits_batch(words, itype, opcode, rd, rs1, rs2, imm):
+    """Decode every word of a program into the given field arrays."""
+    for i in prange(words.shape[0]):
+        t, op, d, s1, s2, im = _decode_bits(words[i])
+        itype[i] = t
+        opcode[i] = op | (t << 5)
+        rd[i] = d
+        rs1[i] = s1
+        rs2[i] = s2
+        imm[i] = im
+
+@dataclass(frozen=True)
 class Instruction:
+    # Declared by hand rather than with dataclass(slots=True) to keep
+    # Python 3.8 support; frozen makes decoded instructions hashable
+    __slots__ = ('type', 'opcode', 'rd', 'rs1', 'rs2', 'imm', 'fields', 'is_ldr', 'sets_flags')
+    
     type: InstructionType
     opcode: Opcode
     rd: int
@@ -55,61 +198,31 @@ class Instruction:
     rs2: int
     imm: int
     
+    if TYPE_CHECKING:
+        # Set in __post_init__; declared for mypy/mypyc only, since a
+        # class-level field() would clash with __slots__ at runtime
+        fields: Tuple[int, int, int, int] = field(init=False, repr=False, compare=False)
+        is_ldr: bool = field(init=False, repr=False, compare=False)
+        sets_flags: bool = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self) -> None:
+        # Derived attributes precomputed for the pipeline's per-cycle checks.
+        # They are not dataclass fields, so they are left out of eq, hash and repr.
+        # fields is (rs1, rs2, rd, imm), unpacked in one go by the decode stage.
+        object.__setattr__(self, 'fields', (self.rs1, self.rs2, self.rd, self.imm))
+        object.__setattr__(self, 'is_ldr',
+                           self.type == InstructionType.MEMORY and self.opcode == Opcode.LDR)
+        object.__setattr__(self, 'sets_flags', self.opcode in _FLAG_OPS)
+    
     @staticmethod
     def decode(word: int) -> Optional['Instruction']:
         """Decode a 32-bit instruction word."""
-        # Extract type (2 bits)
-        instr_type = (word >> 30) & 0x3
-        
-        # Extract opcode based on type
-        if instr_type == 0:  # Arithmetic
-            opcode = (word >> 25) & 0x1F  # 5 bits
-            rd = (word >> 20) & 0x1F      # 5 bits
-            rs1 = (word >> 15) & 0x1F     # 5 bits
-            rs2 = (word >> 10) & 0x1F     # 5 bits
-            imm = word & 0x3FF            # 10 bits
-        elif instr_type == 1:  # Memory
-            opcode = (word >> 28) & 0x3   # 2 bits
-            rd = (word >> 23) & 0x1F      # 5 bits
-            rs1 = (word >> 18) & 0x1F     # 5 bits
-            imm = word & 0x3FFFF          # 18 bits
-            rs2 = 0  # Not used in memory instructions
-        else:  # Control
-            opcode = (word >> 27) & 0x7   # 3 bits
-            if opcode in [Opcode.JMP.value, Opcode.CAL.value, Opcode.FLUSH.value]:
-                rs1 = (word >> 22) & 0x1F  # 5 bits
-                imm = 0  # Not used
-                rs2 = 0  # Not used
-                rd = 0   # Not used
-            else:  # BEQ, BLT
-                imm = word & 0x7FFFFFF    # 27 bits
-                rs1 = 0  # Not used
-                rs2 = 0  # Not used
-                rd = 0   # Not used
+        instr_type, opcode, rd, rs1, rs2, imm = _decode_bits(word)
         
-        # Sign extend immediate if needed
-        if instr_type == 0:  # Arithmetic
-            if imm & 0x200:  # Check sign bit
-                imm |= 0xFFFFFC00  # Extend with 1s
-        elif instr_type == 1:  # Memory
-            if imm & 0x20000:  # Check sign bit
-                imm |= 0xFFFC0000  # Extend with 1s
-        else:  # Control
-            if imm & 0x4000000:  # Check sign bit
-                imm |= 0xF8000000  # Extend with 1s
-        
-        try:
-            opcode_enum = Opcode(opcode | (instr_type << 5))  # Combine type and opcode
-        except ValueError:
+        opcode_enum = _OPCODE_TABLE[opcode | (instr_type << 5)]  # Combine type and opcode
+        if opcode_enum is None:
             return None
-            
-        # Determine instruction type
-        if instr_type == 0:
-            instr_type_enum = InstructionType.ARITHMETIC
-        elif instr_type == 1:
-            instr_type_enum = InstructionType.MEMORY
-        else:
-            instr_type_enum = InstructionType.CONTROL
+        instr_type_enum = _TYPE_BY_INT[instr_type]
             
         return Instruction(
             type=instr_type_enum,
@@ -122,67 +235,97 @@ class Instruction:
     
     def encode(self) -> int:
         """Encode instruction into 32-bit word."""
-        word = 0
-        
-        # Set type bits
-        if self.type == InstructionType.ARITHMETIC:
-            word |= 0 << 30  # Type 00
-            word |= (self.opcode.value & 0x1F) << 25  # 5 bits opcode
-            word |= (self.rd & 0x1F) << 20           # 5 bits rd
-            word |= (self.rs1 & 0x1F) << 15          # 5 bits rs1
-            word |= (self.rs2 & 0x1F) << 10          # 5 bits rs2
-            word |= self.imm & 0x3FF                 # 10 bits imm
-        elif self.type == InstructionType.MEMORY:
-            word |= 1 << 30  # Type 01
-            word |= (self.opcode.value & 0x3) << 28  # 2 bits opcode
-            word |= (self.rd & 0x1F) << 23           # 5 bits rd
-            word |= (self.rs1 & 0x1F) << 18          # 5 bits rs1
-            word |= self.imm & 0x3FFFF               # 18 bits imm
-        else:  # Control
-            word |= 2 << 30  # Type 10
-            word |= (self.opcode.value & 0x7) << 27  # 3 bits opcode
-            if self.opcode in [Opcode.JMP, Opcode.CAL, Opcode.FLUSH]:
-                word |= (self.rs1 & 0x1F) << 22      # 5 bits rs1
-            else:  # BEQ, BLT
-                word |= self.imm & 0x7FFFFFF         # 27 bits imm
-        
-        return word
+        return _encode_bits(_TYPE_INDEX[self.type], self.opcode.value,
+                            self.rd, self.rs1, self.rs2, self.imm)
     
     def __str__(self) -> str:
         """Convert instruction to assembly string."""
-        if self.type == InstructionType.ARITHMETIC:
-            if self.opcode in [Opcode.ADDI, Opcode.SUBI, Opcode.MULI, Opcode.DIVI, 
-                             Opcode.ANDI, Opcode.ORI, Opcode.XORI, Opcode.MODI, 
-                             Opcode.MOVI]:
-                return f"{self.opcode.name.lower()} r{self.rd}, r{self.rs1}, {self.imm}"
-            elif self.opcode in [Opcode.SHL, Opcode.SHR]:
-                return f"{self.opcode.name.lower()} r{self.rd}, {self.imm}"
-            elif self.opcode == Opcode.CMP:
-                return f"{self.opcode.name.lower()} r{self.rs1}, r{self.rs2}"
-            else:
-                return f"{self.opcode.name.lower()} r{self.rd}, r{self.rs1}, r{self.rs2}"
-        elif self.type == InstructionType.MEMORY:
-            if self.opcode == Opcode.LDR:
-                return f"ldr r{self.rd}, [r{self.rs1}, #{self.imm}]"
-            else:  # STR
-                return f"str r{self.rs2}, [r{self.rs1}, #{self.imm}]"
-        else:  # CONTROL
-            if self.opcode == Opcode.JMP:
-                return f"jmp r{self.rs1}"
-            elif self.opcode == Opcode.CAL:
-                return f"cal r{self.rs1}"
-            elif self.opcode == Opcode.FLUSH:
-                return f"flush r{self.rs1}"
-            else:  # BEQ, BLT
-                return f"{self.opcode.name.lower()} #{self.imm}"
+        return _format_instruction(self)
+
+@lru_cache(maxsize=4096)
+def _format_instruction(instr: Instruction) -> str:
+    """Format an instruction as assembly; cached since instructions are immutable."""
+    if instr.type == InstructionType.ARITHMETIC:
+        if instr.opcode in _ARITH_IMM_OPS:
+            return f"{instr.opcode.name.lower()} r{instr.rd}, r{instr.rs1}, {instr.imm}"
+        elif instr.opcode in _SHIFT_OPS:
+            return f"{instr.opcode.name.lower()} r{instr.rd}, {instr.imm}"
+        elif instr.opcode == Opcode.CMP:
+            return f"{instr.opcode.name.lower()} r{instr.rs1}, r{instr.rs2}"
+        elif instr.opcode == Opcode.HALT:
+            return "halt"
+        else:
+            return f"{instr.opcode.name.lower()} r{instr.rd}, r{instr.rs1}, r{instr.rs2}"
+    elif instr.type == InstructionType.MEMORY:
+        if instr.opcode == Opcode.LDR:
+            return f"ldr r{instr.rd}, [r{instr.rs1}, #{instr.imm}]"
+        else:  # STR
+            return f"str r{instr.rs2}, [r{instr.rs1}, #{instr.imm}]"
+    else:  # CONTROL
+        if instr.opcode == Opcode.JMP:
+            return f"jmp r{instr.rs1}"
+        elif instr.opcode == Opcode.CAL:
+            return f"cal r{instr.rs1}"
+        elif instr.opcode == Opcode.FLUSH:
+            return f"flush r{instr.rs1}"
+        else:  # BEQ, BLT
+            return f"{instr.opcode.name.lower()} #{instr.imm}"
+
+def decode_fields(program: List[int]) -> Tuple[np.ndarray, ...]:
+    """Decode the fields of many instruction words at once.
+    
+    Applies the same bit layout and sign extension as Instruction.decode,
+    as whole-array operations, or with a parallel JIT kernel when Numba is
+    installed.
+    
+    Args:
+        program: Instruction words
+        
+    Returns:
+        Tuple of (type, combined opcode, rd, rs1, rs2, imm) arrays, where the
+        combined opcode is the (type << 5 | opcode) value Opcode is keyed by
+    """
+    words = np.asarray(program, dtype=np.int64) & 0xFFFFFFFF
+    if NUMBA_AVAILABLE:
+        fields = tuple(np.empty_like(words) for _ in range(6))
+        _decode_bits_batch(words, *fields)
+        return fields
+    
+    itype = (words >> 30) & 0x3
+    arith = itype == 0
+    mem = itype == 1
+    
+    opcode = np.where(arith, (words >> 25) & 0x1F,
+                      np.where(mem, (words >> 28) & 0x3, (words >> 27) & 0x7))
+    store = mem & (opcode == _STR)
+    rd = np.where(arith, (words >> 20) & 0x1F, np.where(mem & ~store, (words >> 23) & 0x1F, 0))
+    rs1 = np.where(arith, (words >> 15) & 0x1F, np.where(mem, (words >> 18) & 0x1F, 0))
+    rs2 = np.where(arith, (words >> 10) & 0x1F, np.where(store, (words >> 23) & 0x1F, 0))
+    imm = np.where(arith, words & 0x3FF, np.where(mem, words & 0x3FFFF, words & 0x7FFFFFF))
+    
+    # Sign extend immediates
+    sign_bit = np.where(arith, _ARITH_SIGN, np.where(mem, _MEM_SIGN, _CTRL_SIGN))
+    imm = (imm ^ sign_bit) - sign_bit
+    
+    return itype, opcode | (itype << 5), rd, rs1, rs2, imm
 
 class InstructionDecoder:
     def __init__(self):
         self.instructions: List[Instruction] = []
     
     def decode_program(self, program: List[int]) -> List[Instruction]:
-        """Decode a program into a list of instructions."""
-        self.instructions = [Instruction.decode(word) for word in program]
+        """Decode a program into a list of instructions.
+        
+        Fields for the whole program are extracted with decode_fields, so
+        only the Instruction construction runs per word.
+        """
+        itype, opcode, rd, rs1, rs2, imm = decode_fields(program)
+        self.instructions = [
+            None if op is None else Instruction(_TYPE_BY_INT[t], op, d, s1, s2, i)
+            for t, op, d, s1, s2, i in zip(
+                itype.tolist(), [_OPCODE_TABLE[o] for o in opcode.tolist()],
+                rd.tolist(), rs1.tolist(), rs2.tolist(), imm.tolist())
+        ]
         return self.instructions
     
     def encode_program(self, instructions: List[Instruction]) -> List[int]:
@@ -0,0 +1,39 @@
+"""Optional Numba JIT support.
+
+Numba is not a hard dependency of the simulator. When it is installed,
+``njit`` compiles the decorated kernels to native code; otherwise it is a
+no-op and the kernels run as plain Python with identical results.
+``prange`` falls back to ``range`` the same way.
+
+The ``SLITHERRISC_BACKEND`` environment variable selects the backend before
+any kernel is decorated: ``auto`` (default) uses Numba when it is importable,
+``numba`` requires it, and ``python`` never imports it. The pure-Python
+backend is the one to use under PyPy, whose tracing JIT handles the
+fallback kernels well and which Numba does not support.
+"""
+
+import os
+
+BACKEND = os.environ.get("SLITHERRISC_BACKEND", "auto").lower()
+if BACKEND not in ("auto", "numba", "python"):
+    raise ValueError(f"Invalid SLITHERRISC_BACKEND: {BACKEND}")
+
+try:
+    if BACKEND == "python":
+        raise ImportError("Numba disabled by SLITHERRISC_BACKEND=python")
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    if BACKEND == "numba":
+        raise
+    NUMBA_AVAILABLE = False
+    prange = range
+    
+    def njit(*args, **kwargs):
+        """Fallback for numba.njit that returns the function unchanged."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        
+        def decorator(func):
+            return func
+        return decorator
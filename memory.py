@@ -1,61 +1,97 @@
-from dataclasses import dataclass
-from typing import Optional, Dict, List, Tuple
+from typing import Callable, Iterable, Optional, Dict, List, Set, Tuple, Union
 import numpy as np
+from jit import njit
 
-@dataclass
-class CacheLine:
-    valid: bool = False
-    tag: int = 0
-    data: List[int] = None
-    dirty: bool = False
-    
-    def __post_init__(self):
-        if self.data is None:
-            self.data = [0] * 8  # 8 words per line
+# Access kinds for _cache_access
+_READ = 0
+_WRITE = 1
 
-class Cache:
-    def __init__(self, size: int, line_size: int, access_time: int):
-        """Initialize a cache.
-        
-        Args:
-            size: Number of cache lines
-            line_size: Words per cache line
-            access_time: Access time in cycles
-        """
-        self.size = size
-        self.line_size = line_size
-        self.access_time = access_time
-        self.lines = [CacheLine() for _ in range(size)]
-        self.hits = 0
-        self.misses = 0
-        self.last_miss_addr = None
-        self.instruction_fetch_count = 0
+# Recent-miss filter: a 64-bit Bloom filter per generation, indexed by the top
+# six bits of a Fibonacci hash of the address
+_FIB_HASH = 0x9E3779B97F4A7C15
+_U64_MASK = 0xFFFFFFFFFFFFFFFF
+_MISS_GENERATION = 4  # Misses recorded per generation; two generations are kept
+
+# Memory hierarchy configuration: lines, words per line and access time in cycles
+_L1_SIZE = 32  # Optimized for matrix operations
+_L1_LINE = 8
+_L1_LAT = 1
+_L2_SIZE = 128  # Larger to reduce misses
+_L2_LINE = 8
+_L2_LAT = 10
+_MEM_LAT = 100
+
+@njit(cache=True)
+def _cache_access(valid, tags, dirty, data, line_index, tag, offset, value, kind):
+    """Hit check and data access for one cache word.
     
-    def reset(self) -> None:
-        """Reset cache state."""
-        for line in self.lines:
-            line.valid = False
-            line.tag = 0
-            line.data = [0] * self.line_size
-            line.dirty = False
-        self.hits = 0
-        self.misses = 0
-        self.last_miss_addr = None
-        self.instruction_fetch_count = 0
+    A write stores the value and marks the line dirty, allocating the line
+    on a miss. A read only returns the cached word on a hit.
     
-    def get_line_index(self, address: int) -> int:
-        """Get cache line index for an address."""
-        return (address // self.line_size) % self.size
+    Args:
+        valid, tags, dirty, data: Cache line arrays
+        line_index: Cache line index
+        tag: Cache line tag
+        offset: Word offset within the line
+        value: 32-bit value to store (ignored for reads)
+        kind: _READ or _WRITE
+        
+    Returns:
+        Tuple of (hit, data)
+    """
+    hit = valid[line_index] and tags[line_index] == tag
+    if kind == _WRITE:
+        if not hit:
+            valid[line_index] = True
+            tags[line_index] = tag
+        data[line_index, offset] = value
+        dirty[line_index] = True
+        return hit, value
+    if hit:
+        return True, data[line_index, offset]
+    return False, 0
+
+def _make_access(cache: 'Cache') -> Tuple[Callable[..., Tuple[bool, Optional[int], int]],
+                                         Callable[[int, int], Tuple[bool, int]],
+                                         Callable[[np.ndarray, np.ndarray], int]]:
+    """Build a cache's read, write and write_many methods, specialized to its geometry.
     
-    def get_tag(self, address: int) -> int:
-        """Get tag for an address."""
-        return address // (self.size * self.line_size)
+    The decode constants, line arrays and access time are bound as closure
+    variables instead of being looked up on the cache on every access. The
+    arrays are only ever modified in place, so the bindings stay valid.
     
-    def get_offset(self, address: int) -> int:
-        """Get word offset within a cache line."""
-        return address % self.line_size
+    Args:
+        cache: Cache to build the methods for
+        
+    Returns:
+        Tuple of (read, write, write_many) functions
+    """
+    index_shift = cache._index_shift
+    index_mask = cache._index_mask
+    tag_shift = cache._tag_shift
+    offset_mask = cache._offset_mask
+    valid, tags, dirty, data = cache.valid, cache.tags, cache.dirty, cache.data
+    access_time = cache.access_time
+    
+    def count_miss(address: int) -> None:
+        """Count a miss unless the address already missed recently.
+        
+        Recent misses are kept in two generations of a 64-bit Bloom filter, so
+        repeats within the last 4-8 distinct miss addresses are not counted
+        again. False positives can occasionally drop a genuine miss.
+        """
+        bit = 1 << (((int(address) * _FIB_HASH) & _U64_MASK) >> 58)
+        if (cache._recent_misses | cache._older_misses) & bit:
+            return
+        cache.misses += 1
+        cache._recent_misses |= bit
+        cache._recent_count += 1
+        if cache._recent_count == _MISS_GENERATION:
+            cache._older_misses = cache._recent_misses
+            cache._recent_misses = 0
+            cache._recent_count = 0
     
-    def read(self, address: int, is_instruction_fetch: bool = False) -> Tuple[bool, Optional[int], int]:
+    def read(address: int, is_instruction_fetch: bool = False) -> Tuple[bool, Optional[int], int]:
         """Read from cache.
         
         Args:
@@ -65,28 +101,35 @@ class Cache:
         Returns:
             Tuple of (hit, data, cycles)
         """
-        line_index = self.get_line_index(address)
-        tag = self.get_tag(address)
-        offset = self.get_offset(address)
+        line_index = (address >> index_shift) & index_mask
+        tag = address >> tag_shift
+        offset = address & offset_mask
+        
+        # Same line as the last hit: skip the lookup
+        if line_index == cache._last_idx and tag == cache._last_tag:
+            if not is_instruction_fetch:
+                cache.hits += 1
+            return True, cache._last_row.item(offset), access_time
         
-        line = self.lines[line_index]
-        if line.valid and line.tag == tag:
+        hit, value = _cache_access(valid, tags, dirty, data, line_index, tag, offset, 0, _READ)
+        if hit:
             if not is_instruction_fetch:
-                self.hits += 1
-            return True, line.data[offset], self.access_time
+                cache.hits += 1
+            cache._last_idx = line_index
+            cache._last_tag = tag
+            cache._last_row = data[line_index]
+            return True, int(value), access_time
         
         # Only count as a miss if it's not an instruction fetch or if it's the first fetch
-        if not is_instruction_fetch or self.instruction_fetch_count == 0:
-            if address != self.last_miss_addr:
-                self.misses += 1
-                self.last_miss_addr = address
+        if not is_instruction_fetch or cache.instruction_fetch_count == 0:
+            count_miss(address)
         
         if is_instruction_fetch:
-            self.instruction_fetch_count += 1
+            cache.instruction_fetch_count += 1
         
-        return False, None, self.access_time
+        return False, None, access_time
     
-    def write(self, address: int, value: int) -> Tuple[bool, int]:
+    def write(address: int, value: int) -> Tuple[bool, int]:
         """Write to cache.
         
         Args:
@@ -96,28 +139,190 @@ class Cache:
         Returns:
             Tuple of (hit, cycles)
         """
-        line_index = self.get_line_index(address)
-        tag = self.get_tag(address)
-        offset = self.get_offset(address)
-        
-        line = self.lines[line_index]
-        if line.valid and line.tag == tag:
-            self.hits += 1
-            line.data[offset] = value & 0xFFFFFFFF  # Ensure 32-bit value
-            line.dirty = True
-            return True, self.access_time
-        
-        # Only count as a miss if it's a different address than the last miss
-        if address != self.last_miss_addr:
-            self.misses += 1
-            self.last_miss_addr = address
-        
-        # On write miss, allocate a new line
-        line.valid = True
-        line.tag = tag
-        line.data[offset] = value & 0xFFFFFFFF  # Ensure 32-bit value
-        line.dirty = True
-        return False, self.access_time
+        line_index = (address >> index_shift) & index_mask
+        tag = address >> tag_shift
+        offset = address & offset_mask
+        
+        # Stores the value (allocating the line on a miss)
+        hit, _ = _cache_access(valid, tags, dirty, data, line_index, tag, offset,
+                               value & 0xFFFFFFFF, _WRITE)  # Ensure 32-bit value
+        if hit:
+            cache.hits += 1
+            return True, access_time
+        
+        # The miss allocated the line for a new tag
+        if line_index == cache._last_idx:
+            cache._forget_last_line()
+        
+        count_miss(address)
+        return False, access_time
+    
+    def write_many(addresses: np.ndarray, values: np.ndarray) -> int:
+        """Write a batch of words, with the same effect as calling write on each in order.
+        
+        Args:
+            addresses: Memory addresses to write, in write order
+            values: 32-bit values to write
+            
+        Returns:
+            Number of cycles taken
+        """
+        line_indices = (addresses >> index_shift) & index_mask
+        line_tags = addresses >> tag_shift
+        offsets = addresses & offset_mask
+        
+        # A write hits when the previous write to its line (or, for the first
+        # one, the line's current contents) has the same tag
+        order = np.argsort(line_indices, kind="stable")
+        sorted_indices = line_indices[order]
+        sorted_tags = line_tags[order]
+        first = np.ones(order.size, dtype=bool)
+        first[1:] = sorted_indices[1:] != sorted_indices[:-1]
+        previous_tags = np.empty_like(sorted_tags)
+        previous_tags[1:] = sorted_tags[:-1]
+        previous_tags[first] = tags[sorted_indices[first]]
+        sorted_hits = previous_tags == sorted_tags
+        sorted_hits[first] &= valid[sorted_indices[first]]
+        hits = np.empty_like(sorted_hits)
+        hits[order] = sorted_hits
+        
+        # The last write to each line sets its tag, and to each word its value
+        last = np.ones(order.size, dtype=bool)
+        last[:-1] = first[1:]
+        final_indices = sorted_indices[last]
+        valid[final_indices] = True
+        tags[final_indices] = sorted_tags[last]
+        dirty[final_indices] = True
+        words = line_indices * data.shape[1] + offsets
+        _, last_writes = np.unique(words[::-1], return_index=True)
+        last_writes = words.size - 1 - last_writes
+        data[line_indices[last_writes], offsets[last_writes]] = values[last_writes]
+        
+        misses = ~hits
+        if np.any(misses & (line_indices == cache._last_idx)):
+            cache._forget_last_line()
+        cache.hits += int(np.count_nonzero(hits))
+        for address in addresses[misses].tolist():
+            count_miss(address)
+        return access_time * int(addresses.size)
+    
+    return read, write, write_many
+
+class Cache:
+    # Every read/write touches several of these, so skip the per-instance dict
+    __slots__ = ('size', 'line_size', 'access_time',
+                 '_offset_mask', '_index_shift', '_index_mask', '_tag_shift',
+                 'valid', 'tags', 'dirty', 'data', 'dirty_words',
+                 '_last_idx', '_last_tag', '_last_row',
+                 'hits', 'misses', '_recent_misses', '_older_misses', '_recent_count',
+                 'instruction_fetch_count', 'read', 'write', 'write_many')
+    
+    def __init__(self, size: int, line_size: int, access_time: int):
+        """Initialize a cache.
+        
+        Line state is stored as parallel NumPy arrays indexed by line
+        number (structure of arrays) rather than one object per line.
+        
+        Args:
+            size: Number of cache lines
+            line_size: Words per cache line
+            access_time: Access time in cycles
+        """
+        if size <= 0 or size & (size - 1) or line_size <= 0 or line_size & (line_size - 1):
+            raise ValueError(f"Cache size and line size must be powers of two: {size}, {line_size}")
+        
+        self.size = size
+        self.line_size = line_size
+        self.access_time = access_time
+        
+        # Address decode constants, replacing // and % by the power-of-two sizes
+        self._offset_mask = line_size - 1
+        self._index_shift = line_size.bit_length() - 1
+        self._index_mask = size - 1
+        self._tag_shift = self._index_shift + size.bit_length() - 1
+        
+        self.valid = np.zeros(size, dtype=bool)
+        self.tags = np.zeros(size, dtype=np.int64)
+        self.dirty = np.zeros(size, dtype=bool)
+        self.data = np.zeros((size, line_size), dtype=np.uint32)
+        # Words stored since the line was filled; only tracked in write-back mode
+        self.dirty_words = np.zeros((size, line_size), dtype=bool)
+        
+        # Last line that hit: (index, tag) and its data row, checked before the full lookup.
+        # Anything that changes a line's tag or validity must call _forget_last_line.
+        self._last_idx = -1
+        self._last_tag = -1
+        self._last_row = self.data[0]  # Never read while _last_idx is -1
+        
+        self.hits = 0
+        self.misses = 0
+        self._forget_recent_misses()
+        self.instruction_fetch_count = 0
+        
+        # read(address, is_instruction_fetch=False), write(address, value) and
+        # write_many(addresses, values), see _make_access
+        self.read, self.write, self.write_many = _make_access(self)
+    
+    def reset(self) -> None:
+        """Reset cache state."""
+        self.valid[:] = False
+        self.tags[:] = 0
+        self.dirty[:] = False
+        self.data[:] = 0
+        self.dirty_words[:] = False
+        self._forget_last_line()
+        self.hits = 0
+        self.misses = 0
+        self._forget_recent_misses()
+        self.instruction_fetch_count = 0
+    
+    def _forget_recent_misses(self) -> None:
+        """Clear the recent-miss filter used to avoid counting repeated misses."""
+        self._recent_misses = 0
+        self._older_misses = 0
+        self._recent_count = 0
+    
+    def _forget_last_line(self) -> None:
+        """Drop the remembered last-hit line."""
+        self._last_idx = -1
+        self._last_tag = -1
+    
+    def refill(self, address: int, data: int) -> int:
+        """Allocate the line holding an address and store one word in it.
+        
+        The rest of the line is cleared.
+        
+        Args:
+            address: Memory address being filled
+            data: Value stored at the address
+            
+        Returns:
+            Index of the refilled line
+        """
+        line_index = (address >> self._index_shift) & self._index_mask
+        self._forget_last_line()
+        self.valid[line_index] = True
+        self.tags[line_index] = address >> self._tag_shift
+        row = self.data[line_index]  # Clear the line in place
+        row.fill(0)
+        row[address & self._offset_mask] = data
+        return line_index
+    
+    def get_line_index(self, address: int) -> int:
+        """Get cache line index for an address."""
+        return (address >> self._index_shift) & self._index_mask
+    
+    def get_tag(self, address: int) -> int:
+        """Get tag for an address."""
+        return address >> self._tag_shift
+    
+    def get_offset(self, address: int) -> int:
+        """Get word offset within a cache line."""
+        return address & self._offset_mask
+    
+    def get_line_base(self, tag: int, line_index: int) -> int:
+        """Get the memory index a line is written back to."""
+        return (tag * self.size + line_index) * 4
     
     def get_stats(self) -> Dict[str, float]:
         """Get cache statistics."""
@@ -130,36 +335,51 @@ class Cache:
         }
 
 class MemorySystem:
-    def __init__(self, memory_size: int = 16384, cache_enabled: bool = True, pipeline_enabled: bool = True):
+    __slots__ = ('memory', 'cache_enabled', 'pipeline_enabled', 'write_back',
+                 'L1_cache', 'L2_cache', 'last_fetch_addr', 'cycles', 'program_end',
+                 'changed_words', 'changed_lines', 'all_changed')
+    
+    # Main memory access time in cycles (fixed; the hot paths use _MEM_LAT)
+    memory_access_time = _MEM_LAT
+    
+    def __init__(self, memory_size: int = 16384, cache_enabled: bool = True, pipeline_enabled: bool = True,
+                 write_back: bool = False):
         """Initialize memory system.
         
         Args:
             memory_size: Size of main memory in words (default: 16384 = 64KB)
             cache_enabled: Whether cache is enabled
             pipeline_enabled: Whether pipeline is enabled
+            write_back: Keep stores in L1 and write them to L2 and main memory
+                only when the line is evicted or on flush(), instead of writing
+                through to every level. Call sync() before reading main memory
+                directly and flush() before disabling the cache. Addresses
+                are word-aligned in this mode, so two byte addresses of one
+                main memory word cannot be held dirty in different slots.
         """
-        # Main memory (64KB)
-        self.memory = np.zeros(memory_size, dtype=np.int64)
+        # Main memory (64KB) of 32-bit words
+        self.memory = np.zeros(memory_size, dtype=np.uint32)
         
         # Cache configuration
         self.cache_enabled = cache_enabled
         self.pipeline_enabled = pipeline_enabled
+        self.write_back = write_back
         
-        # L1 Cache (32 lines, 8 words per line) - Optimized for matrix operations
-        self.L1_cache = Cache(32, 8, 1)
-        
-        # L2 Cache (128 lines, 8 words per line) - Larger to reduce misses
-        self.L2_cache = Cache(128, 8, 10)
-        
-        # Memory access time (100 cycles)
-        self.memory_access_time = 100
+        # L1 and L2 caches (see the configuration constants above)
+        self.L1_cache = Cache(_L1_SIZE, _L1_LINE, _L1_LAT)
+        self.L2_cache = Cache(_L2_SIZE, _L2_LINE, _L2_LAT)
         
         # Track last instruction fetch
-        self.last_fetch_addr = None
+        self.last_fetch_addr: Optional[int] = None
         
         # Performance counters
         self.cycles = 0
         self.program_end = 0  # Track end address of loaded program
+        
+        # Change tracking for incremental views; None until track_changes is called
+        self.changed_words: Optional[Set[int]] = None  # Main memory word indices
+        self.changed_lines: Optional[Set[Tuple[int, int]]] = None  # (cache level, line index)
+        self.all_changed = True
     
     def reset(self) -> None:
         """Reset memory system state."""
@@ -169,39 +389,48 @@ class MemorySystem:
         self.last_fetch_addr = None
         self.cycles = 0
         self.program_end = 0
+        self.all_changed = True
     
-    def load_program(self, program: List[int]) -> None:
+    def load_program(self, program: Union[List[int], bytes, np.ndarray]) -> None:
         """Load program into memory.
         
         Args:
-            program: List of instructions to load
+            program: List of instructions to load, a uint32 array of them (copied
+                without conversion), or raw bytes (one word per byte)
         """
         # Reset memory and caches
         self.reset()
         
-        # Load program into memory at word-aligned addresses
-        for i, instruction in enumerate(program):
-            addr = i  # Instructions are already word-aligned
-            self.memory[addr] = instruction & 0xFFFFFFFF  # Ensure 32-bit value
-            
-            # Pre-load program into L1 cache
-            if self.cache_enabled:
-                line_index = self.L1_cache.get_line_index(addr)
-                tag = self.L1_cache.get_tag(addr)
-                offset = self.L1_cache.get_offset(addr)
-                
-                # Allocate cache line if needed
-                line = self.L1_cache.lines[line_index]
-                if not line.valid or line.tag != tag:
-                    line.valid = True
-                    line.tag = tag
-                    line.data = [0] * self.L1_cache.line_size
-                
-                # Load instruction into cache line
-                line.data[offset] = instruction & 0xFFFFFFFF
+        # Copy the whole program into memory in one bulk assignment
+        words: np.ndarray
+        if isinstance(program, (bytes, bytearray, memoryview)):
+            words = np.frombuffer(program, dtype=np.uint8)
+        elif isinstance(program, np.ndarray) and program.dtype == np.uint32:
+            words = program  # Already 32-bit words
+        else:
+            words = np.asarray(program, dtype=np.int64) & 0xFFFFFFFF  # Ensure 32-bit values
+        if words.size > self.memory.size:
+            raise ValueError(f"Program too large for memory: {words.size} instructions")
+        self.memory[:words.size] = words  # Instructions are already word-aligned
+        
+        # Pre-load program into L1 cache. Words are loaded in address order, so a
+        # line ends up holding only the last block mapped to it; a word is kept
+        # when no later block of the program maps to the same line.
+        if self.cache_enabled and words.size:
+            cache = self.L1_cache
+            addrs = np.arange(words.size)
+            offsets = addrs & cache._offset_mask
+            keep = addrs - offsets + cache.size * cache.line_size >= words.size
+            addrs = addrs[keep]
+            line_indices = (addrs >> cache._index_shift) & cache._index_mask
+            cache._forget_last_line()
+            cache.valid[line_indices] = True
+            cache.tags[line_indices] = addrs >> cache._tag_shift
+            cache.data[line_indices, offsets[keep]] = words[keep]
         
         # Update program end address
         self.program_end = len(program)
+        self.all_changed = True
     
     def read(self, address: int, is_instruction_fetch: bool = False) -> Tuple[int, int]:
         """Read from memory system.
@@ -222,71 +451,100 @@ class MemorySystem:
             
         cycles = 0
         if not self.cache_enabled:
-            cycles = self.memory_access_time
+            cycles = _MEM_LAT
             self.cycles += cycles
-            return self.memory[word_index], cycles
+            return self.memory.item(word_index), cycles
+            
+        if self.write_back:
+            address &= ~3  # Word-aligned, as in write
             
         # For instruction fetches, only count cache access if it's a new fetch
         if is_instruction_fetch:
             if address == self.last_fetch_addr:
-                return self.memory[word_index], 0
+                return self.memory.item(word_index), 0
             self.last_fetch_addr = address
             
         # Try L1 cache first
-        hit, data, cycles1 = self.L1_cache.read(address, is_instruction_fetch)
-        if hit:
+        _, data, cycles1 = self.L1_cache.read(address, is_instruction_fetch)
+        if data is not None:  # Hit
             self.cycles += cycles1
             return data, cycles1
             
         # Try L2 cache
-        hit, data, cycles2 = self.L2_cache.read(address, is_instruction_fetch)
-        if hit:
+        _, data, cycles2 = self.L2_cache.read(address, is_instruction_fetch)
+        if data is not None:  # Hit
             # On L2 hit, update L1 cache
-            line_index = self.L1_cache.get_line_index(address)
-            tag = self.L1_cache.get_tag(address)
-            offset = self.L1_cache.get_offset(address)
-            
-            # Allocate L1 cache line
-            line = self.L1_cache.lines[line_index]
-            line.valid = True
-            line.tag = tag
-            line.data = [0] * self.L1_cache.line_size
-            line.data[offset] = data
+            if self.write_back:
+                cycles2 += self._write_back_line(self.L1_cache.get_line_index(address))
+            line_index = self.L1_cache.refill(address, data)
+            if self.changed_lines is not None:
+                self.changed_lines.add((1, line_index))
             
             cycles = cycles1 + cycles2
             self.cycles += cycles
             return data, cycles
             
         # Cache miss, read from memory
-        data = self.memory[word_index]
+        data = self.memory.item(word_index)
         
         # Update both cache levels
-        line_index = self.L1_cache.get_line_index(address)
-        tag = self.L1_cache.get_tag(address)
-        offset = self.L1_cache.get_offset(address)
-        
-        # Update L1 cache
-        line = self.L1_cache.lines[line_index]
-        line.valid = True
-        line.tag = tag
-        line.data = [0] * self.L1_cache.line_size
-        line.data[offset] = data
-        
-        # Update L2 cache
-        line_index = self.L2_cache.get_line_index(address)
-        tag = self.L2_cache.get_tag(address)
-        offset = self.L2_cache.get_offset(address)
-        line = self.L2_cache.lines[line_index]
-        line.valid = True
-        line.tag = tag
-        line.data = [0] * self.L2_cache.line_size
-        line.data[offset] = data
+        if self.write_back:
+            cycles2 += self._write_back_line(self.L1_cache.get_line_index(address))
+        l1_index = self.L1_cache.refill(address, data)
+        l2_index = self.L2_cache.refill(address, data)
+        if self.changed_lines is not None:
+            self.changed_lines.add((1, l1_index))
+            self.changed_lines.add((2, l2_index))
         
         # Calculate total cycles
-        cycles = cycles1 + cycles2 + self.memory_access_time
+        cycles = cycles1 + cycles2 + _MEM_LAT
         self.cycles += cycles
         return data, cycles
     
+    def read_many(self, addresses: Iterable[int], is_instruction_fetch: bool = False) -> List[Tuple[int, int]]:
+        """Read several addresses in order, with the same effect as calling read on each.
+        
+        Args:
+            addresses: Memory addresses to read (byte addresses), in read order
+            is_instruction_fetch: Whether these reads are for instruction fetch
+            
+        Returns:
+            List of (data, cycles) tuples, one per address
+            
+        Raises:
+            ValueError: If an address is invalid
+        """
+        read = self.read
+        return [read(address, is_instruction_fetch) for address in addresses]
+    
+    def peek(self, address: int) -> int:
+        """Read the current value at an address without a simulated access.
+        
+        Caches, hit/miss statistics and cycle counts are left untouched, so
+        this is safe for polling from outside the simulation. In write-back
+        mode a word still held dirty in L1 is returned from L1.
+        
+        Args:
+            address: Memory address to read (byte address)
+            
+        Returns:
+            Stored value
+            
+        Raises:
+            ValueError: If address is invalid
+        """
+        word_index = address // 4
+        if not 0 <= word_index < len(self.memory):
+            raise ValueError(f"Invalid memory address: {address}")
+        if self.cache_enabled and self.write_back:
+            address &= ~3  # Word-aligned, as in write
+            cache = self.L1_cache
+            line_index = (address >> cache._index_shift) & cache._index_mask
+            if cache.dirty_words[line_index, address & cache._offset_mask] and \
+                    cache.valid[line_index] and cache.tags[line_index] == address >> cache._tag_shift:
+                return cache.data.item(line_index, address & cache._offset_mask)
+        return self.memory.item(word_index)
+    
     def write(self, address: int, value: int) -> int:
         """Write to memory system.
         
@@ -304,9 +562,25 @@ class MemorySystem:
         if not 0 <= word_index < len(self.memory):
             raise ValueError(f"Invalid memory address: {address}")
         cycles = 0
+        value &= 0xFFFFFFFF  # Ensure 32-bit value
+        if self.write_back:
+            address &= ~3  # Word-aligned, so every address of a word shares one cache slot
+        if self.changed_lines is not None:
+            self._note_write(address, word_index)
         if not self.cache_enabled:
             self.memory[word_index] = value
-            cycles = self.memory_access_time
+            cycles = _MEM_LAT
+            self.cycles += cycles
+            return cycles
+        if self.write_back:
+            # Write-back policy: store in L1 only, evicting the line it replaces
+            cache = self.L1_cache
+            line_index = (address >> cache._index_shift) & cache._index_mask
+            if not (cache.valid[line_index] and cache.tags[line_index] == address >> cache._tag_shift):
+                cycles += self._write_back_line(line_index)
+            hit1, cycles1 = cache.write(address, value)
+            cache.dirty_words[line_index, address & cache._offset_mask] = True
+            cycles += cycles1
             self.cycles += cycles
             return cycles
         # Write-through policy: write to all levels
@@ -316,7 +590,166 @@ class MemorySystem:
         # Try L2 cache
         hit2, cycles2 = self.L2_cache.write(address, value)
         # Calculate total cycles
-        cycles = cycles1 + cycles2 + self.memory_access_time
+        cycles = cycles1 + cycles2 + _MEM_LAT
+        self.cycles += cycles
+        return cycles
+    
+    def write_range(self, address: int, values: Union[List[int], np.ndarray]) -> int:
+        """Write consecutive words starting at an address.
+        
+        Has the same effect as calling write for each value at address,
+        address + 4, ..., but updates memory with one slice assignment and
+        each cache level with one batched write.
+        
+        Args:
+            address: Memory address of the first word (byte address)
+            values: Values to write
+            
+        Returns:
+            Number of cycles taken
+            
+        Raises:
+            ValueError: If any address in the range is invalid
+        """
+        words = (np.asarray(values, dtype=np.int64) & 0xFFFFFFFF).astype(np.uint32)  # Ensure 32-bit values
+        first_word = address // 4
+        if words.size and not (0 <= first_word and first_word + words.size <= len(self.memory)):
+            raise ValueError(f"Invalid memory range: {address} (+{words.size} words)")
+        if self.cache_enabled and self.write_back:
+            # Write-back evictions depend on the order of the writes
+            return sum(self.write(address + 4 * i, value) for i, value in enumerate(words.tolist()))
+        if not words.size:
+            return 0
+        
+        addresses = address + 4 * np.arange(words.size, dtype=np.int64)
+        self.memory[first_word:first_word + words.size] = words
+        if not self.cache_enabled:
+            cycles = _MEM_LAT * int(words.size)
+            if self.changed_words is not None:
+                self.changed_words.update(range(first_word, first_word + words.size))
+            self.cycles += cycles
+            return cycles
+        
+        cycles = (self.L1_cache.write_many(addresses, words) + self.L2_cache.write_many(addresses, words)
+                  + _MEM_LAT * int(words.size))
+        changed_words, changed_lines = self.changed_words, self.changed_lines
+        if changed_words is not None and changed_lines is not None:
+            changed_words.update(range(first_word, first_word + words.size))
+            for level, cache in ((1, self.L1_cache), (2, self.L2_cache)):
+                line_indices = (addresses >> cache._index_shift) & cache._index_mask
+                changed_lines.update((level, i) for i in np.unique(line_indices).tolist())
+        self.cycles += cycles
+        return cycles
+    
+    def track_changes(self) -> None:
+        """Start recording changed memory words and cache lines for take_changes."""
+        self.changed_words = set()
+        self.changed_lines = set()
+        self.all_changed = True
+    
+    def take_changes(self) -> Tuple[bool, Set[int], Set[Tuple[int, int]]]:
+        """Return and clear the changes recorded since the last call.
+        
+        Returns:
+            Tuple of (all_changed, changed word indices, changed (cache level,
+            line index) pairs). When all_changed is set, as after a reset or
+            program load, the sets are incomplete and everything must be redrawn.
+        """
+        changes = (self.all_changed, self.changed_words or set(), self.changed_lines or set())
+        if self.changed_lines is not None:
+            self.changed_words = set()
+            self.changed_lines = set()
+        self.all_changed = False
+        return changes
+    
+    def _note_write(self, address: int, word_index: int) -> None:
+        """Record the words and lines a write will change; only called while tracking."""
+        changed_words, changed_lines = self.changed_words, self.changed_lines
+        assert changed_words is not None and changed_lines is not None
+        if not self.cache_enabled:
+            changed_words.add(word_index)
+            return
+        cache = self.L1_cache
+        changed_lines.add((1, (address >> cache._index_shift) & cache._index_mask))
+        if not self.write_back:
+            cache = self.L2_cache
+            changed_lines.add((2, (address >> cache._index_shift) & cache._index_mask))
+            changed_words.add(word_index)
+    
+    def _write_back_line(self, line_index: int) -> int:
+        """Write the stored words of a dirty L1 line to L2 (where it holds them) and memory.
+        
+        Args:
+            line_index: L1 line index
+            
+        Returns:
+            Number of cycles taken
+        """
+        cache = self.L1_cache
+        if not cache.dirty[line_index]:
+            return 0
+        copied = self._copy_dirty_words(line_index)
+        cache.dirty[line_index] = False
+        cache.dirty_words[line_index] = False
+        return _MEM_LAT if copied else 0
+    
+    def _copy_dirty_words(self, line_index: int) -> bool:
+        """Copy the stored words of an L1 line to L2 (where it holds them) and memory.
+        
+        The line stays dirty, so its write-back is still charged on eviction.
+        
+        Args:
+            line_index: L1 line index
+            
+        Returns:
+            Whether the line held any stored words
+        """
+        cache = self.L1_cache
+        offsets = np.flatnonzero(cache.dirty_words[line_index])
+        if not offsets.size:
+            return False
+        
+        # Rebuild the byte addresses of the stored words from tag, index and offset
+        addresses = ((int(cache.tags[line_index]) << cache._tag_shift)
+                     | (line_index << cache._index_shift) | offsets)
+        values = cache.data[line_index, offsets]
+        self.memory[addresses >> 2] = values
+        
+        l2 = self.L2_cache
+        l2_indices = (addresses >> l2._index_shift) & l2._index_mask
+        present = l2.valid[l2_indices] & (l2.tags[l2_indices] == addresses >> l2._tag_shift)
+        l2.data[l2_indices[present], (addresses & l2._offset_mask)[present]] = values[present]
+        changed_words, changed_lines = self.changed_words, self.changed_lines
+        if changed_words is not None and changed_lines is not None:
+            changed_words.update((addresses >> 2).tolist())
+            changed_lines.update((2, i) for i in l2_indices[present].tolist())
+        return True
+    
+    def sync(self) -> None:
+        """Copy every dirty L1 line to main memory so it is current.
+        
+        Only has an effect in write-back mode. The lines stay dirty and no
+        cycles are counted, so views can sync without changing the simulated
+        timing: a later eviction still pays for its write-back.
+        """
+        if not self.write_back or not self.cache_enabled:
+            return
+        for line_index in np.flatnonzero(self.L1_cache.dirty).tolist():
+            self._copy_dirty_words(line_index)
+    
+    def flush(self) -> int:
+        """Write every dirty L1 line back, as evictions would.
+        
+        Only has an effect in write-back mode. Unlike sync the lines end up
+        clean and the write-backs are counted.
+        
+        Returns:
+            Number of cycles taken
+        """
+        if not self.write_back or not self.cache_enabled:
+            return 0
+        cycles = sum(self._write_back_line(line_index)
+                     for line_index in np.flatnonzero(self.L1_cache.dirty).tolist())
         self.cycles += cycles
         return cycles
     
@@ -333,24 +766,22 @@ class MemorySystem:
         if not self.cache_enabled:
             return
             
-        # Flush L1 cache
-        line_index = self.L1_cache.get_line_index(address)
-        tag = self.L1_cache.get_tag(address)
-        L1_line = self.L1_cache.lines[line_index]
-        
-        if L1_line.valid and L1_line.tag == tag:
-            for i in range(4):
-                mem_addr = (tag * self.L1_cache.size * 4) + (line_index * 4) + i
-                self.memory[mem_addr] = L1_line.data[i]
-            L1_line.dirty = False
-        
-        # Flush L2 cache
-        line_index = self.L2_cache.get_line_index(address)
-        tag = self.L2_cache.get_tag(address)
-        L2_line = self.L2_cache.lines[line_index]
-        
-        if L2_line.valid and L2_line.tag == tag:
-            for i in range(4):
-                mem_addr = (tag * self.L2_cache.size * 4) + (line_index * 4) + i
-                self.memory[mem_addr] = L2_line.data[i]
-            L2_line.dirty = False 
\ No newline at end of file
+        if self.write_back:
+            address &= ~3  # Word-aligned, as in write
+            cache = self.L1_cache
+            line_index = (address >> cache._index_shift) & cache._index_mask
+            if cache.valid[line_index] and cache.tags[line_index] == address >> cache._tag_shift:
+                self._write_back_line(line_index)
+        
+        for cache in (self.L1_cache, self.L2_cache):
+            line_index = (address >> cache._index_shift) & cache._index_mask
+            tag = address >> cache._tag_shift
+            if cache.valid[line_index] and cache.tags[line_index] == tag:
+                # One slice copy of the line's first four words. Writing the full
+                # line_size would overlap the neighbouring line's base, which is
+                # only four words further on in get_line_base's layout.
+                base = (tag * cache.size + line_index) * 4  # get_line_base, inlined
+                self.memory[base:base + 4] = cache.data[line_index, :4]
+                cache.dirty[line_index] = False
+                if self.changed_words is not None:
+                    self.changed_words.update(range(base, base + 4))
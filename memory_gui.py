@@ -1,7 +1,32 @@
 import tkinter as tk
 from tkinter import ttk
+from functools import lru_cache
+from typing import List, Optional, Set, Tuple
+import numpy as np
 from memory import MemorySystem
 
+
+# Most simulator memory holds zeros or a handful of repeated words, so the
+# per-value formatters are memoized across GUI updates.
+@lru_cache(maxsize=4096)
+def _fmt_hex(value: int) -> str:
+    return f"{value:08x}"
+
+
+@lru_cache(maxsize=4096)
+def _fmt_bin(value: int) -> str:
+    return f"{value:032b}"
+
+
+@lru_cache(maxsize=4096)
+def _fmt_dec(value: int) -> str:
+    return str(value)
+
+
+_FORMATTERS = {"hex": _fmt_hex, "binary": _fmt_bin, "decimal": _fmt_dec}
+for _fmt in _FORMATTERS.values():
+    _fmt(0)
+
 class MemoryGUI:
     def __init__(self, root):
         self.root = root
@@ -9,6 +34,9 @@ class MemoryGUI:
         
         # Create memory instance
         self.memory = MemorySystem(memory_size=4096, cache_enabled=True, pipeline_enabled=True)
+        self.memory.track_changes()  # Lets refreshes redraw only the changed rows
+        self._update_pending = False  # A coalesced update_all_views refresh is scheduled
+        self._drawn_format = None  # Value format the views were last fully drawn in
         
         # Create main frame
         self.main_frame = ttk.Frame(root, padding="10")
@@ -130,6 +158,7 @@ class MemoryGUI:
         self.update_all_views()
         
     def toggle_cache(self):
+        self.memory.flush()
         self.memory.cache_enabled = self.cache_var.get()
         self.update_all_views()
         
@@ -139,38 +168,66 @@ class MemoryGUI:
         
     def format_value(self, value: int) -> str:
         """Format a value according to the selected format."""
+        return _FORMATTERS.get(self.format_var.get(), _fmt_dec)(value)
+        
+    def format_values(self, values: np.ndarray) -> List[str]:
+        """Format an array of values according to the selected format in one pass."""
         if self.format_var.get() == "hex":
-            return f"{value:08x}"
+            return np.char.mod("%08x", values).tolist()
         elif self.format_var.get() == "binary":
-            return f"{value:032b}"
+            return [_fmt_bin(v) for v in values.tolist()]
         else:  # decimal
-            return str(value)
-        
-    def update_memory_view(self):
+            return np.char.mod("%d", values).tolist()
+        
+    @staticmethod
+    def _replace_line(text: tk.Text, line: int, content: str) -> None:
+        """Replace the contents of one (1-based) line of a Text widget."""
+        text.delete(f"{line}.0", f"{line}.end")
+        text.insert(f"{line}.0", content)
+        
+    def update_memory_view(self, words: Optional[Set[int]] = None):
+        """Redraw the memory view, or only the rows holding the given word indices."""
+        self.memory.sync()
+        if words is not None:
+            for row in sorted({w >> 2 for w in words if w < 100}):
+                i = row * 4
+                cells = self.format_values(self.memory.memory[i:min(i + 4, 100)])
+                self._replace_line(self.memory_text, row + 1, f"{i:04x}: {' '.join(cells)}")
+            return
+        cells = self.format_values(self.memory.memory[:100])
+        rows = [f"{i:04x}: {' '.join(cells[i:i+4])}\n" for i in range(0, len(cells), 4)]
         self.memory_text.delete(1.0, tk.END)
-        for i in range(0, min(100, len(self.memory.memory)), 4):
-            values = self.memory.memory[i:i+4]
-            formatted_values = [self.format_value(v) for v in values]
-            self.memory_text.insert(tk.END, f"{i:04x}: {' '.join(formatted_values)}\n")
+        self.memory_text.insert(tk.END, "".join(rows))
             
-    def update_cache_views(self):
-        # Update L1 cache view
-        self.l1_text.delete(1.0, tk.END)
-        for i, line in enumerate(self.memory.L1_cache.lines):
-            if line.valid:
-                formatted_data = [self.format_value(v) for v in line.data]
-                self.l1_text.insert(tk.END, f"Line {i}: Tag={line.tag}, Data={' '.join(formatted_data)}\n")
-            else:
-                self.l1_text.insert(tk.END, f"Line {i}: Invalid\n")
-        
-        # Update L2 cache view
-        self.l2_text.delete(1.0, tk.END)
-        for i, line in enumerate(self.memory.L2_cache.lines):
-            if line.valid:
-                formatted_data = [self.format_value(v) for v in line.data]
-                self.l2_text.insert(tk.END, f"Line {i}: Tag={line.tag}, Data={' '.join(formatted_data)}\n")
-            else:
-                self.l2_text.insert(tk.END, f"Line {i}: Invalid\n")
+    def _cache_line_text(self, cache, i: int) -> str:
+        """Format one cache line as shown in the cache views."""
+        if cache.valid[i]:
+            formatted_data = [self.format_value(v) for v in cache.data[i].tolist()]
+            return f"Line {i}: Tag={int(cache.tags[i])}, Data={' '.join(formatted_data)}"
+        return f"Line {i}: Invalid"
+        
+    def update_cache_views(self, lines: Optional[Set[Tuple[int, int]]] = None):
+        """Redraw both cache views, or only the given (cache level, line index) rows."""
+        if lines is not None:
+            views = {1: (self.memory.L1_cache, self.l1_text), 2: (self.memory.L2_cache, self.l2_text)}
+            for level, i in sorted(lines):
+                cache, text = views[level]
+                self._replace_line(text, i + 1, self._cache_line_text(cache, i))
+            return
+        
+        self._redraw_cache_view(self.memory.L1_cache, self.l1_text)
+        self._redraw_cache_view(self.memory.L2_cache, self.l2_text)
+        
+    def _redraw_cache_view(self, cache, text: tk.Text) -> None:
+        """Replace a whole cache view with a single Text insert."""
+        line_size = cache.line_size
+        cells = self.format_values(cache.data.ravel())
+        tags = np.char.mod("%d", cache.tags).tolist()
+        rows = [f"Line {i}: Tag={tags[i]}, Data={' '.join(cells[i * line_size:(i + 1) * line_size])}\n"
+                if valid else f"Line {i}: Invalid\n"
+                for i, valid in enumerate(cache.valid.tolist())]
+        text.delete(1.0, tk.END)
+        text.insert(tk.END, "".join(rows))
                 
     def update_stats_view(self):
         stats = self.memory.get_stats()
@@ -188,8 +245,23 @@ class MemoryGUI:
         self.stats_text.insert(tk.END, f"Total Cycles: {stats['cycles']}")
         
     def update_all_views(self):
-        self.update_memory_view()
-        self.update_cache_views()
+        """Schedule a refresh of every view; calls made before Tk is idle share one refresh."""
+        if not self._update_pending:
+            self._update_pending = True
+            self.root.after_idle(self._refresh_all_views)
+        
+    def _refresh_all_views(self):
+        self._update_pending = False
+        self.memory.sync()
+        all_changed, words, lines = self.memory.take_changes()
+        fmt = self.format_var.get()
+        if all_changed or fmt != self._drawn_format:
+            self._drawn_format = fmt
+            self.update_memory_view()
+            self.update_cache_views()
+        else:
+            self.update_memory_view(words)
+            self.update_cache_views(lines)
         self.update_stats_view()
 
 if __name__ == "__main__":
@@ -1,6 +1,5 @@
-from dataclasses import dataclass
 from enum import IntEnum
-from typing import Dict, List
+from typing import Dict, List, Sequence
 
 class SpecialRegisters(IntEnum):
     """Special register indices."""
@@ -10,29 +9,62 @@ class SpecialRegisters(IntEnum):
     STAT = 35  # Status Register (flags)
     XZR = 36   # Constant Zero Register
 
-@dataclass
+# Flag bits in Flags.bits
+_ZERO_FLAG = 1
+_NEGATIVE_FLAG = 2
+_CARRY_FLAG = 4
+_OVERFLOW_FLAG = 8
+_ERROR_FLAG = 16
+
+def _flag_property(bit: int, doc: str) -> property:
+    """Expose one bit of Flags.bits as a bool attribute."""
+    def get_bit(self: 'Flags') -> bool:
+        return self.bits & bit != 0
+    
+    def set_bit(self: 'Flags', value: bool) -> None:
+        if value:
+            self.bits |= bit
+        else:
+            self.bits &= ~bit
+    
+    return property(get_bit, set_bit, doc=doc)
+
 class Flags:
-    """Processor flags."""
-    zero: bool = False      # Zero flag
-    negative: bool = False  # Negative flag
-    carry: bool = False     # Carry flag
-    overflow: bool = False  # Overflow flag
-    error: bool = False     # Error flag (e.g., division by zero)
+    """Processor flags.
+    
+    All five flags live in one integer, bits, so an ALU update is a single
+    store; the named attributes read and write individual bits.
+    """
+    __slots__ = ('bits',)
+    
+    zero = _flag_property(_ZERO_FLAG, "Zero flag")
+    negative = _flag_property(_NEGATIVE_FLAG, "Negative flag")
+    carry = _flag_property(_CARRY_FLAG, "Carry flag")
+    overflow = _flag_property(_OVERFLOW_FLAG, "Overflow flag")
+    error = _flag_property(_ERROR_FLAG, "Error flag (e.g., division by zero)")
+    
+    def __init__(self, zero: bool = False, negative: bool = False, carry: bool = False,
+                 overflow: bool = False, error: bool = False):
+        self.bits = (zero * _ZERO_FLAG | negative * _NEGATIVE_FLAG | carry * _CARRY_FLAG
+                     | overflow * _OVERFLOW_FLAG | error * _ERROR_FLAG)
+    
+    def __repr__(self) -> str:
+        return (f"Flags(zero={self.zero}, negative={self.negative}, carry={self.carry}, "
+                f"overflow={self.overflow}, error={self.error})")
     
     def update(self, result: int, carry: bool = False, overflow: bool = False) -> None:
         """Update flags based on result and operation."""
-        self.zero = result == 0
-        self.negative = (result & 0x80000000) != 0
-        self.carry = carry
-        self.overflow = overflow
+        # Bit 31 of the result is the sign, for masked and negative values alike;
+        # the error flag is kept
+        self.bits = ((self.bits & _ERROR_FLAG) | (result == 0) | ((result >> 31) & 1) << 1
+                     | carry << 2 | overflow << 3)
     
     def clear(self) -> None:
         """Clear all flags."""
-        self.zero = False
-        self.negative = False
-        self.carry = False
-        self.overflow = False
-        self.error = False
+        self.bits = 0
+
+# Contents of the general purpose registers after a reset
+_ZERO_REGISTERS = (0,) * 32
 
 class RegisterFile:
     """Register file implementation."""
@@ -52,11 +84,13 @@ class RegisterFile:
     
     def reset(self) -> None:
         """Reset register file state."""
-        self.registers = [0] * 32
+        # In place, so the register list and Flags are reused, and references
+        # to them (e.g. the pipeline's) stay valid
+        self.registers[:] = _ZERO_REGISTERS
         self.pc = 0
         self.lr = 0
         self.sp = 0x1000
-        self.flags = Flags()
+        self.flags.clear()
     
     def get(self, index: int) -> int:
         """Get register value.
@@ -67,10 +101,10 @@ class RegisterFile:
         Returns:
             Register value
         """
-        if index == SpecialRegisters.XZR:
-            return 0
-        elif 0 <= index < 32:
+        if 0 <= index < 32:
             return self.registers[index]
+        elif index == SpecialRegisters.XZR:
+            return 0
         elif index == SpecialRegisters.PC:
             return self.pc
         elif index == SpecialRegisters.LR:
@@ -80,6 +114,15 @@ class RegisterFile:
         else:
             raise ValueError(f"Invalid register index: {index}")
     
+    def get_all(self) -> Sequence[int]:
+        """Get all general purpose register values in one call.
+
+        Returns:
+            Values of R0-R31 indexed by register number. This is the live
+            backing list, so callers must treat it as read-only.
+        """
+        return self.registers
+
     def set(self, index: int, value: int) -> None:
         """Set register value.
         
@@ -87,13 +130,16 @@ class RegisterFile:
             index: Register index (0-31 for general purpose, 32+ for special)
             value: Value to set
         """
+        # General purpose registers first, as nearly every write targets one
+        if 0 < index < 32:
+            self.registers[index] = value & 0xFFFFFFFF  # Ensure 32-bit value
+            return
+        
         # Ensure 32-bit value
         value = value & 0xFFFFFFFF
         
-        if index in [0, SpecialRegisters.XZR]:
+        if index == 0 or index == SpecialRegisters.XZR:
             return  # R0 and XZR are read-only
-        elif 0 < index < 32:
-            self.registers[index] = value
         elif index == SpecialRegisters.PC:
             self.pc = value
         elif index == SpecialRegisters.LR:
@@ -109,23 +155,23 @@ class RegisterFile:
     
     def get_zero_flag(self) -> bool:
         """Get zero flag."""
-        return self.flags.zero
+        return self.flags.bits & _ZERO_FLAG != 0
     
     def get_negative_flag(self) -> bool:
         """Get negative flag."""
-        return self.flags.negative
+        return self.flags.bits & _NEGATIVE_FLAG != 0
     
     def get_carry_flag(self) -> bool:
         """Get carry flag."""
-        return self.flags.carry
+        return self.flags.bits & _CARRY_FLAG != 0
     
     def get_overflow_flag(self) -> bool:
         """Get overflow flag."""
-        return self.flags.overflow
+        return self.flags.bits & _OVERFLOW_FLAG != 0
     
     def get_error_flag(self) -> bool:
         """Get error flag."""
-        return self.flags.error
+        return self.flags.bits & _ERROR_FLAG != 0
     
     def set_overflow_flag(self, value: bool) -> None:
         """Set overflow flag."""
@@ -69,6 +69,18 @@ class TestAssembler(unittest.TestCase):
         instructions, errors = self.assembler.assemble(source)
         self.assertTrue(len(errors) > 0)
     
+    def test_halt(self):
+        """Test HALT parsing and decoding."""
+        source = "halt"
+        instructions, errors = self.assembler.assemble(source)
+        self.assertEqual(len(errors), 0)
+        self.assertEqual(Instruction.decode(instructions[0]).opcode, Opcode.HALT)
+        
+        # HALT takes no operands
+        source = "halt r1"
+        instructions, errors = self.assembler.assemble(source)
+        self.assertTrue(len(errors) > 0)
+    
     def test_labels(self):
         """Test label handling."""
         source = """
@@ -104,6 +116,38 @@ class TestAssembler(unittest.TestCase):
         instructions, errors = self.assembler.assemble(source)
         self.assertEqual(len(errors), 0)
         self.assertEqual(len(instructions), 3)
+        
+        # Test signed and upper-case prefixed immediates
+        self.assertEqual(self.assembler.parse_immediate("-5"), -5)
+        self.assertEqual(self.assembler.parse_immediate("-0x10"), -16)
+        self.assertEqual(self.assembler.parse_immediate("0XFF"), 255)
+        self.assertEqual(self.assembler.parse_immediate("0B11"), 3)
+        
+        # Test invalid immediates
+        self.assertIsNone(self.assembler.parse_immediate("0x"))
+        self.assertIsNone(self.assembler.parse_immediate("12a"))
+        self.assertIsNone(self.assembler.parse_immediate("-"))
+    
+    def test_empty_operands(self):
+        """Test that stray commas are rejected instead of skipped."""
+        for source in ("add r1,,r2,r3", "add r1, r2,, r3", "add r1, r2, r3,", "add r1, , r3"):
+            instructions, errors = self.assembler.assemble(source)
+            self.assertTrue(len(errors) > 0, source)
+            self.assertEqual(len(instructions), 0, source)
+            self.assertIsNone(self.assembler.parse_instruction(source, 1), source)
+    
+    def test_encoding_matches_instruction(self):
+        """Test that encoded words match Instruction.encode."""
+        cases = [
+            ("add r1, r2, r3", Instruction(InstructionType.ARITHMETIC, Opcode.ADD, 1, 2, 3, 0)),
+            ("subi r4, r5, -3", Instruction(InstructionType.ARITHMETIC, Opcode.SUBI, 4, 5, 0, -3)),
+            ("ldr r6, [r7, 0x10]", Instruction(InstructionType.MEMORY, Opcode.LDR, 6, 7, 0, 16)),
+            ("str r2, [r1, -8]", Instruction(InstructionType.MEMORY, Opcode.STR, 0, 1, 2, -8)),
+            ("blt -2", Instruction(InstructionType.CONTROL, Opcode.BLT, 0, 0, 0, -2)),
+            ("cal r8", Instruction(InstructionType.CONTROL, Opcode.CAL, 0, 8, 0, 0)),
+        ]
+        for line, expected in cases:
+            self.assertEqual(self.assembler.parse_instruction(line, 1), expected.encode(), line)
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
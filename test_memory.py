@@ -10,13 +10,12 @@ def test_sequential_access():
     
     # Write sequential values
     print("Writing sequential values...")
-    for i in range(0, 64, 4):  # Write 16 cache lines
-        mem.write(i, i)
+    addresses = range(0, 64, 4)  # 16 cache lines
+    mem.write_range(0, list(addresses))  # Value i at address i
     
     # Read values back (should hit in L1 cache)
     print("\nReading values (should hit in L1 cache)...")
-    for i in range(0, 64, 4):
-        value, cycles = mem.read(i)
+    for i, (value, cycles) in zip(addresses, mem.read_many(addresses)):
         print(f"Address {i:04x}: Value={value}, Cycles={cycles}")
     
     # Get stats
@@ -44,8 +43,7 @@ def test_random_access():
     
     # Read values back (should miss in L1, hit in L2)
     print("\nReading values (should miss in L1, hit in L2)...")
-    for addr in addresses:
-        value, cycles = mem.read(addr)
+    for addr, (value, cycles) in zip(addresses, mem.read_many(addresses)):
         print(f"Address {addr:04x}: Value={value}, Cycles={cycles}")
     
     # Get stats
@@ -130,6 +128,72 @@ def test_instruction_fetch():
     print(f"L2 Cache: Hits={stats['L2']['hits']}, Misses={stats['L2']['misses']}, Hit Rate={stats['L2']['hit_rate']:.2f}%")
     print(f"Total cycles: {stats['cycles']}")
 
+def test_write_range():
+    """Test that a burst write matches the equivalent single writes."""
+    print("\nTesting burst writes:")
+    print("-" * 50)
+    
+    # Create two identical memory systems
+    burst = MemorySystem(memory_size=4096, cache_enabled=True, pipeline_enabled=True)
+    single = MemorySystem(memory_size=4096, cache_enabled=True, pipeline_enabled=True)
+    
+    # Write 64 words (more than L1 holds, so lines are replaced within the burst)
+    values = [(i * 0x01010101) & 0xFFFFFFFF for i in range(64)]
+    cycles = burst.write_range(0x40, values)
+    expected = sum(single.write(0x40 + 4 * i, v) for i, v in enumerate(values))
+    print(f"Burst cycles={cycles}, single-write cycles={expected}")
+    assert cycles == expected
+    assert burst.get_stats() == single.get_stats()
+    
+    # Read values back
+    for i in range(len(values)):
+        assert burst.read(0x40 + 4 * i) == single.read(0x40 + 4 * i)
+
+def test_peek():
+    """Test that peek returns stored values without touching the statistics."""
+    for write_back in (False, True):
+        mem = MemorySystem(memory_size=4096, cache_enabled=True, pipeline_enabled=True,
+                           write_back=write_back)
+        mem.write(0, 0xFFFF)
+        mem.write(0x40, 7)
+        stats = mem.get_stats()
+        assert mem.peek(0) == 0xFFFF
+        assert mem.peek(0x40) == 7
+        assert mem.peek(0x80) == 0
+        assert mem.get_stats() == stats
+
+def test_sync_keeps_timing():
+    """Test that sync updates main memory without changing the write-back cost."""
+    conflict = 32 * 8  # Maps to the same L1 line as address 0
+    unsynced = MemorySystem(memory_size=4096, cache_enabled=True, pipeline_enabled=True,
+                            write_back=True)
+    synced = MemorySystem(memory_size=4096, cache_enabled=True, pipeline_enabled=True,
+                          write_back=True)
+    for mem in (unsynced, synced):
+        mem.write(0, 0xFFFF)
+    synced.sync()
+    assert synced.memory[0] == 0xFFFF
+    assert synced.get_stats() == unsynced.get_stats()
+    
+    # The eviction still pays for writing the dirty line back
+    assert synced.read(conflict) == unsynced.read(conflict)
+    assert synced.get_stats() == unsynced.get_stats()
+    assert synced.peek(0) == unsynced.peek(0) == 0xFFFF
+
+def test_write_back_shared_word():
+    """Test that write-back keeps the last store to a word written at two byte addresses."""
+    results = []
+    for write_back in (False, True):
+        mem = MemorySystem(memory_size=4096, cache_enabled=True, pipeline_enabled=True,
+                           write_back=write_back)
+        mem.write(1690, 35)  # Same main memory word (422) as 1688
+        mem.write_range(1688, [12, 13, 14])
+        mem.flush()
+        assert mem.peek(1690) == 12
+        results.append(mem.memory[420:426].tolist())
+    assert results[0] == results[1]
+    assert results[1][2] == 12
+
 if __name__ == "__main__":
     # Run all tests
     test_sequential_access()
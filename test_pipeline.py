@@ -1,274 +1,130 @@
+import random
 import pytest
 from pipeline import Pipeline, PipelineStage, HazardType
 from cache import MemorySystem
 from registers import RegisterFile, Flags, SpecialRegisters
 from isa import Instruction, Opcode, InstructionType
+from assembler import Assembler
+from _alu_oracle import alu_ref, REGISTER_OPS, IMMEDIATE_OPS
 
-@pytest.fixture
+# The memory system, register file and pipeline are built once per module;
+# reset_state puts them back in their initial state before every test
+
+@pytest.fixture(scope="module")
 def memory():
     """Create memory system fixture."""
     return MemorySystem()
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def registers():
     """Create register file fixture."""
     return RegisterFile()
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def pipeline(memory, registers):
     """Create pipeline fixture."""
-    pipeline = Pipeline(memory, registers)
-    pipeline.reset()  # Reset pipeline state
-    return pipeline
-
-def test_arithmetic_instructions(pipeline, registers):
-    """Test arithmetic instructions."""
-    # Test ADD
-    pipeline.reset()
-    registers.reset()
-    instruction = Instruction(
-        opcode=Opcode.ADD,
-        type=InstructionType.ARITHMETIC,
-        rd=1,
-        rs1=2,
-        rs2=3,
-        imm=0
-    )
-    registers.set(2, 5)
-    registers.set(3, 3)
-    pipeline.memory.load_program([instruction.encode()])
-    pipeline.run(5)
-    assert registers.get(1) == 8
-
-    # Test ADDI
-    pipeline.reset()
-    registers.reset()
-    instruction = Instruction(
-        opcode=Opcode.ADDI,
-        type=InstructionType.ARITHMETIC,
-        rd=1,
-        rs1=2,
-        imm=10
-    )
-    registers.set(2, 5)
-    pipeline.memory.load_program([instruction.encode()])
-    pipeline.run(5)
-    assert registers.get(1) == 15
-
-    # Test ADDIS
-    pipeline.reset()
-    registers.reset()
-    instruction = Instruction(
-        opcode=Opcode.ADDIS,
-        type=InstructionType.ARITHMETIC,
-        rd=1,
-        rs1=2,
-        imm=-5
-    )
-    registers.set(2, 5)
-    pipeline.memory.load_program([instruction.encode()])
-    pipeline.run(5)
-    assert registers.get(1) == 0
-    assert registers.get_zero_flag()
-    assert not registers.get_negative_flag()
-
-    # Test SUBI
-    pipeline.reset()
-    registers.reset()
-    instruction = Instruction(
-        opcode=Opcode.SUBI,
-        type=InstructionType.ARITHMETIC,
-        rd=1,
-        rs1=2,
-        imm=3
-    )
-    registers.set(2, 5)
-    pipeline.memory.load_program([instruction.encode()])
-    pipeline.run(5)
-    assert registers.get(1) == 2  # 5 - 3 = 2
-
-    # Test SUBIS
-    pipeline.reset()
-    registers.reset()
-    instruction = Instruction(
-        opcode=Opcode.SUBIS,
-        type=InstructionType.ARITHMETIC,
-        rd=1,
-        rs1=2,
-        imm=5
-    )
-    registers.set(2, 5)
-    pipeline.memory.load_program([instruction.encode()])
-    pipeline.run(5)
-    assert registers.get(1) == 0  # 5 - 5 = 0
-    assert registers.get_zero_flag()
-    assert not registers.get_negative_flag()
+    return Pipeline(memory, registers)
 
-    # Test MULI
-    pipeline.reset()
+@pytest.fixture(autouse=True)
+def reset_state(memory, registers, pipeline):
+    """Reset the shared fixtures, including pipeline settings tests change."""
+    memory.reset()
     registers.reset()
-    instruction = Instruction(
-        opcode=Opcode.MULI,
-        type=InstructionType.ARITHMETIC,
-        rd=1,
-        rs1=2,
-        imm=3
-    )
-    registers.set(2, 5)
-    pipeline.memory.load_program([instruction.encode()])
-    pipeline.run(5)
-    assert registers.get(1) == 15  # 5 * 3 = 15
-
-    # Test DIVI
     pipeline.reset()
-    registers.reset()
-    instruction = Instruction(
-        opcode=Opcode.DIVI,
-        type=InstructionType.ARITHMETIC,
-        rd=1,
-        rs1=2,
-        imm=2
-    )
-    registers.set(2, 10)
-    pipeline.memory.load_program([instruction.encode()])
-    pipeline.run(5)
-    assert registers.get(1) == 5  # 10 / 2 = 5
+    pipeline.enabled = True
+    pipeline.early_writeback = False
 
-    # Test DIVI with division by zero
-    pipeline.reset()
-    registers.reset()
-    instruction = Instruction(
-        opcode=Opcode.DIVI,
-        type=InstructionType.ARITHMETIC,
-        rd=1,
-        rs1=2,
-        imm=0
-    )
-    registers.set(2, 10)
-    pipeline.memory.load_program([instruction.encode()])
-    pipeline.run(5)
+# (opcode, rs2, imm, register inputs, expected r1, expected (zero, negative)
+# flags or None); every case computes r1 from r2 and, for ADD, r3
+ARITHMETIC_CASES = [
+    (Opcode.ADD, 3, 0, {2: 5, 3: 3}, 8, None),
+    (Opcode.ADDI, 0, 10, {2: 5}, 15, None),
+    (Opcode.ADDIS, 0, -5, {2: 5}, 0, (True, False)),
+    (Opcode.SUBI, 0, 3, {2: 5}, 2, None),  # 5 - 3 = 2
+    (Opcode.SUBIS, 0, 5, {2: 5}, 0, (True, False)),  # 5 - 5 = 0
+    (Opcode.MULI, 0, 3, {2: 5}, 15, None),  # 5 * 3 = 15
+    (Opcode.DIVI, 0, 2, {2: 10}, 5, None),  # 10 / 2 = 5
     # Should not update register when dividing by zero
-    assert registers.get(1) == 0
-
-    # Test ANDI
-    pipeline.reset()
-    registers.reset()
-    instruction = Instruction(
-        opcode=Opcode.ANDI,
-        type=InstructionType.ARITHMETIC,
-        rd=1,
-        rs1=2,
-        imm=0x0F  # 0000 1111 in binary
-    )
-    registers.set(2, 0x3F)  # 0011 1111 in binary
-    pipeline.memory.load_program([instruction.encode()])
-    pipeline.run(5)
-    assert registers.get(1) == 0x0F  # 0000 1111 in binary
-
-    # Test ANDI with zero
-    pipeline.reset()
-    registers.reset()
-    instruction = Instruction(
-        opcode=Opcode.ANDI,
-        type=InstructionType.ARITHMETIC,
-        rd=1,
-        rs1=2,
-        imm=0
-    )
-    registers.set(2, 0xFFFF)
-    pipeline.memory.load_program([instruction.encode()])
-    pipeline.run(5)
-    assert registers.get(1) == 0  # Any number AND 0 = 0
+    (Opcode.DIVI, 0, 0, {2: 10}, 0, None),
+    (Opcode.ANDI, 0, 0x0F, {2: 0x3F}, 0x0F, None),  # 0011 1111 & 0000 1111
+    (Opcode.ANDI, 0, 0, {2: 0xFFFF}, 0, None),  # Any number AND 0 = 0
+    (Opcode.ORI, 0, 0xF0, {2: 0x0F}, 0xFF, None),  # 0000 1111 | 1111 0000
+    (Opcode.ORI, 0, 0, {2: 0xFFFF}, 0xFFFF, None),  # Any number OR 0 = same number
+    (Opcode.XORI, 0, 0xFF, {2: 0x55}, 0xAA, None),  # 0101 0101 ^ 1111 1111
+    (Opcode.XORI, 0, 0, {2: 0xFFFF}, 0xFFFF, None),  # Any number XOR 0 = same number
+    (Opcode.SHR, 0, 2, {2: 0x0C}, 0x03, None),  # 0000 1100 >> 2 = 0000 0011
+    (Opcode.SHR, 0, 0, {2: 0xFFFF}, 0xFFFF, None),  # Shifted right by 0 = same number
+]
 
-    # Test ORI
-    pipeline.reset()
-    registers.reset()
-    instruction = Instruction(
-        opcode=Opcode.ORI,
-        type=InstructionType.ARITHMETIC,
-        rd=1,
-        rs1=2,
-        imm=0xF0  # 1111 0000 in binary
-    )
-    registers.set(2, 0x0F)  # 0000 1111 in binary
-    pipeline.memory.load_program([instruction.encode()])
-    pipeline.run(5)
-    assert registers.get(1) == 0xFF  # 1111 1111 in binary
-
-    # Test ORI with zero
-    pipeline.reset()
-    registers.reset()
-    instruction = Instruction(
-        opcode=Opcode.ORI,
-        type=InstructionType.ARITHMETIC,
-        rd=1,
-        rs1=2,
-        imm=0
-    )
-    registers.set(2, 0xFFFF)
-    pipeline.memory.load_program([instruction.encode()])
-    pipeline.run(5)
-    assert registers.get(1) == 0xFFFF  # Any number OR 0 = same number
-
-    # Test XORI
-    pipeline.reset()
-    registers.reset()
+@pytest.mark.parametrize("opcode,rs2,imm,inputs,expected,flags", ARITHMETIC_CASES,
+                         ids=[f"{case[0].name}-{case[2]}" for case in ARITHMETIC_CASES])
+def test_arithmetic_instructions(pipeline, registers, opcode, rs2, imm, inputs, expected, flags):
+    """Test arithmetic instructions."""
     instruction = Instruction(
-        opcode=Opcode.XORI,
+        opcode=opcode,
         type=InstructionType.ARITHMETIC,
         rd=1,
         rs1=2,
-        imm=0xFF  # 1111 1111 in binary
+        rs2=rs2,
+        imm=imm
     )
-    registers.set(2, 0x55)  # 0101 0101 in binary
+    for reg, value in inputs.items():
+        registers.set(reg, value)
     pipeline.memory.load_program([instruction.encode()])
-    pipeline.run(5)
-    assert registers.get(1) == 0xAA  # 1010 1010 in binary
+    assert pipeline.run_until_retired(1, 10) == 5  # Retires in writeback, the fifth cycle
+    assert registers.get(1) == expected
+    if flags is not None:
+        zero, negative = flags
+        assert registers.get_zero_flag() == zero
+        assert registers.get_negative_flag() == negative
 
-    # Test XORI with zero
-    pipeline.reset()
-    registers.reset()
-    instruction = Instruction(
-        opcode=Opcode.XORI,
-        type=InstructionType.ARITHMETIC,
-        rd=1,
-        rs1=2,
-        imm=0
-    )
-    registers.set(2, 0xFFFF)
-    pipeline.memory.load_program([instruction.encode()])
-    pipeline.run(5)
-    assert registers.get(1) == 0xFFFF  # Any number XOR 0 = same number
+def _oracle_cases(count, seed):
+    """Build (opcode, rs1 value, rs2 value or immediate) cases for alu_ref."""
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(count):
+        a = rng.choice((0, 1, rng.getrandbits(8), rng.getrandbits(32)))
+        if rng.random() < 0.5:
+            opcode = rng.choice(REGISTER_OPS)
+            b = rng.choice((0, 1, rng.getrandbits(8), rng.getrandbits(32)))
+        else:
+            opcode = rng.choice(IMMEDIATE_OPS)
+            if opcode in (Opcode.SHL, Opcode.SHR):
+                b = rng.randrange(32)
+            else:
+                b = rng.randrange(-512, 512)  # 10-bit signed immediate
+        cases.append((opcode, a, b))
+    return cases
 
-    # Test SHR
-    pipeline.reset()
-    registers.reset()
-    instruction = Instruction(
-        opcode=Opcode.SHR,
-        type=InstructionType.ARITHMETIC,
-        rd=1,
-        rs1=2,
-        imm=2
-    )
-    registers.set(2, 0x0C)  # 0000 1100 in binary
-    pipeline.memory.load_program([instruction.encode()])
-    pipeline.run(5)
-    assert registers.get(1) == 0x03  # 0000 0011 in binary (shifted right by 2)
+# Fixed seed, so every run checks the same cases
+ALU_ORACLE_CASES = _oracle_cases(1024, seed=0x5EED)
 
-    # Test SHR with zero
-    pipeline.reset()
-    registers.reset()
-    instruction = Instruction(
-        opcode=Opcode.SHR,
-        type=InstructionType.ARITHMETIC,
-        rd=1,
-        rs1=2,
-        imm=0
-    )
-    registers.set(2, 0xFFFF)
-    pipeline.memory.load_program([instruction.encode()])
-    pipeline.run(5)
-    assert registers.get(1) == 0xFFFF  # Any number shifted right by 0 = same number
+def test_arithmetic_oracle(pipeline, registers):
+    """Test arithmetic results against the reference ALU over a fixed table of cases."""
+    mismatches = []
+    for opcode, a, b in ALU_ORACLE_CASES:
+        pipeline.reset()
+        registers.reset()
+        registers.set(2, a)
+        if opcode in REGISTER_OPS:
+            registers.set(3, b)
+            rs2, imm = 3, 0
+        else:
+            rs2, imm = 0, b
+        instruction = Instruction(
+            opcode=opcode,
+            type=InstructionType.ARITHMETIC,
+            rd=1,
+            rs1=2,
+            rs2=rs2,
+            imm=imm
+        )
+        pipeline.memory.load_program([instruction.encode()])
+        pipeline.run_until_retired(1, 10)
+        expected = alu_ref(opcode.value, a, b)
+        if registers.get(1) != expected:
+            mismatches.append((opcode.name, a, b, registers.get(1), expected))
+    assert not mismatches, mismatches[:10]
 
 def test_memory_instructions(pipeline, registers, memory):
     """Test memory instructions."""
@@ -296,6 +152,36 @@ def test_memory_instructions(pipeline, registers, memory):
     assert memory.read(100)[0] == 42
     assert registers.get(3) == 42
 
+def test_store_writes_source_register(pipeline, registers, memory):
+    """Test that an assembled STR stores the value of its source register."""
+    program, errors = Assembler().assemble("addi r2, r0, 42\nstr r2, [r0, 0x100]\nhalt")
+    assert not errors
+    for enabled in (True, False):
+        pipeline.reset()
+        registers.reset()
+        pipeline.enabled = enabled
+        pipeline.memory.load_program(program)
+        pipeline.run_for(100)
+        assert pipeline.halted
+        assert memory.read(0x100)[0] == 42
+
+def test_load_use_forwarding(pipeline, registers, memory):
+    """Test that instructions right after a load get the loaded value."""
+    program, errors = Assembler().assemble(
+        "ldr r1, [r0, 0x100]\nldr r2, [r0, 0x104]\nmul r3, r1, r2\nadd r4, r2, r2\nhalt")
+    assert not errors
+    for enabled in (True, False):
+        pipeline.reset()
+        registers.reset()
+        pipeline.enabled = enabled
+        pipeline.memory.load_program(program)
+        memory.write(0x100, 6)
+        memory.write(0x104, 7)
+        pipeline.run_for(100)
+        assert pipeline.halted
+        assert registers.get(3) == 42
+        assert registers.get(4) == 14
+
 def test_jal_instruction(pipeline, registers):
     """Test JAL instruction."""
     instruction = Instruction(
@@ -355,6 +241,134 @@ def test_hazard_detection(pipeline, registers):
     pipeline.run(10)
     assert registers.get(4) == 10  # 8 + 2
 
+def test_early_writeback(pipeline, registers):
+    """Test that writing arithmetic results in execute gives the same results."""
+    pipeline.early_writeback = True
+    add_instruction = Instruction(
+        opcode=Opcode.ADD,
+        type=InstructionType.ARITHMETIC,
+        rd=1,
+        rs1=2,
+        rs2=3,
+        imm=0
+    )
+    use_instruction = Instruction(
+        opcode=Opcode.ADD,
+        type=InstructionType.ARITHMETIC,
+        rd=4,
+        rs1=1,
+        rs2=5,
+        imm=0
+    )
+    registers.set(2, 5)
+    registers.set(3, 3)
+    registers.set(5, 2)
+    pipeline.memory.load_program([add_instruction.encode(), use_instruction.encode()])
+    pipeline.run(10)
+    assert registers.get(1) == 8
+    assert registers.get(4) == 10  # 8 + 2
+
+def test_early_writeback_after_load(pipeline, registers):
+    """Test that an early write is not overwritten by an older load to the same register."""
+    load_instruction = Instruction(
+        opcode=Opcode.LDR,
+        type=InstructionType.MEMORY,
+        rd=1,
+        rs1=0,
+        rs2=0,
+        imm=0x100
+    )
+    movi_instruction = Instruction(
+        opcode=Opcode.ADDI,
+        type=InstructionType.ARITHMETIC,
+        rd=1,
+        rs1=0,
+        rs2=0,
+        imm=9
+    )
+    for early_writeback in (False, True):
+        pipeline.reset()
+        registers.reset()
+        pipeline.early_writeback = early_writeback
+        pipeline.memory.load_program([load_instruction.encode(), movi_instruction.encode()])
+        pipeline.memory.write(0x100, 77)
+        pipeline.run(8)
+        assert registers.get(1) == 9  # The younger ADDI wins
+
+def test_halt(pipeline, registers):
+    """Test that HALT sets halted once it retires."""
+    movi_instruction = Instruction(
+        opcode=Opcode.MOVI,
+        type=InstructionType.ARITHMETIC,
+        rd=1,
+        rs1=0,
+        rs2=0,
+        imm=7
+    )
+    halt_instruction = Instruction(
+        opcode=Opcode.HALT,
+        type=InstructionType.ARITHMETIC,
+        rd=0,
+        rs1=0,
+        rs2=0,
+        imm=0
+    )
+    pipeline.memory.load_program([movi_instruction.encode(), halt_instruction.encode()])
+    cycles = pipeline.run_for(20)
+    assert pipeline.halted
+    assert cycles < 20
+    assert registers.get(1) == 7
+    assert pipeline.run_for(20) == 0  # A halted pipeline stays put
+    pipeline.reset()
+    assert not pipeline.halted
+
+def test_halt_squashes_younger_instructions(pipeline, registers, memory):
+    """Test that instructions after HALT neither store nor write registers."""
+    program = [
+        Instruction(opcode=Opcode.ADDI, type=InstructionType.ARITHMETIC,
+                    rd=1, rs1=0, rs2=0, imm=5).encode(),
+        Instruction(opcode=Opcode.HALT, type=InstructionType.ARITHMETIC,
+                    rd=0, rs1=0, rs2=0, imm=0).encode(),
+        Instruction(opcode=Opcode.STR, type=InstructionType.MEMORY,
+                    rd=0, rs1=0, rs2=1, imm=64).encode(),
+        Instruction(opcode=Opcode.ADDI, type=InstructionType.ARITHMETIC,
+                    rd=2, rs1=0, rs2=0, imm=7).encode(),
+    ]
+    for enabled, early_writeback in ((True, False), (True, True), (False, False)):
+        pipeline.reset()
+        registers.reset()
+        pipeline.enabled = enabled
+        pipeline.early_writeback = early_writeback
+        pipeline.memory.load_program(program)
+        pipeline.run_for(100)
+        assert pipeline.halted
+        assert registers.get(1) == 5
+        assert registers.get(2) == 0
+        assert memory.read(64)[0] == 0
+
+def test_reset_in_place(pipeline, registers):
+    """Test that reset clears state without replacing the underlying objects."""
+    gprs = registers.registers
+    flags = registers.flags
+    stages = list(pipeline.stages)
+    registers.set(1, 5)
+    registers.update_flags(0)
+    pipeline.memory.load_program([Instruction(
+        opcode=Opcode.ADDI,
+        type=InstructionType.ARITHMETIC,
+        rd=2,
+        rs1=1,
+        rs2=0,
+        imm=1
+    ).encode()])
+    pipeline.run(3)
+    registers.reset()
+    pipeline.reset()
+    assert registers.registers is gprs and gprs == [0] * 32
+    assert registers.flags is flags and not registers.get_zero_flag()
+    assert all(a is b for a, b in zip(pipeline.stages, stages))
+    assert all(stage.instruction is None for stage in pipeline.stages)
+
 def test_special_registers(pipeline, registers):
     """Test special register behavior."""
     # Test XZR register
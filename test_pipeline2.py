@@ -1,55 +1,15 @@
+import logging
+import os
 from memory import MemorySystem
 from pipeline import Pipeline, PipelineStage, HazardType
 from registers import RegisterFile
 from isa import Instruction, InstructionType, Opcode
+from _instr_helpers import (create_add_instruction, create_sub_instruction,
+                            create_ldr_instruction, create_str_instruction)
 
-def create_add_instruction(rd: int, rs1: int, rs2: int) -> int:
-    """Create an ADD instruction."""
-    instr = Instruction(
-        type=InstructionType.ARITHMETIC,
-        opcode=Opcode.ADD,
-        rd=rd,
-        rs1=rs1,
-        rs2=rs2,
-        imm=0
-    )
-    return instr.encode()
-
-def create_sub_instruction(rd: int, rs1: int, rs2: int) -> int:
-    """Create a SUB instruction."""
-    instr = Instruction(
-        type=InstructionType.ARITHMETIC,
-        opcode=Opcode.SUB,
-        rd=rd,
-        rs1=rs1,
-        rs2=rs2,
-        imm=0
-    )
-    return instr.encode()
-
-def create_ldr_instruction(rd: int, rs1: int, offset: int) -> int:
-    """Create a LDR instruction."""
-    instr = Instruction(
-        type=InstructionType.MEMORY,
-        opcode=Opcode.LDR,
-        rd=rd,
-        rs1=rs1,
-        rs2=0,
-        imm=offset
-    )
-    return instr.encode()
-
-def create_str_instruction(rs2: int, rs1: int, offset: int) -> int:
-    """Create a STR instruction."""
-    instr = Instruction(
-        type=InstructionType.MEMORY,
-        opcode=Opcode.STR,
-        rd=0,
-        rs1=rs1,
-        rs2=rs2,
-        imm=offset
-    )
-    return instr.encode()
+# Diagnostic output goes to debug, which is off unless enabled (VERBOSE=1
+# when run as a script, or e.g. pytest --log-cli-level=DEBUG)
+log = logging.getLogger(__name__)
 
 def test_sequential_execution():
     """Test pipeline with sequential instructions."""
@@ -72,12 +32,12 @@ def test_sequential_execution():
     
     # Print statistics
     stats = pipeline.get_stats()
-    print("\nSequential Execution Test:")
-    print(f"Cycles: {stats['cycles']}")
-    print(f"Instructions: {stats['instructions']}")
-    print(f"CPI: {stats['cpi']:.2f}")
-    print(f"Stalls: {stats['stalls']}")
-    print(f"Flushes: {stats['flushes']}")
+    log.debug("\nSequential Execution Test:")
+    log.debug("Cycles: %s", stats['cycles'])
+    log.debug("Instructions: %s", stats['instructions'])
+    log.debug("CPI: %.2f", stats['cpi'])
+    log.debug("Stalls: %s", stats['stalls'])
+    log.debug("Flushes: %s", stats['flushes'])
 
 def test_hazard_detection():
     """Test pipeline hazard detection."""
@@ -99,12 +59,12 @@ def test_hazard_detection():
     
     # Print statistics
     stats = pipeline.get_stats()
-    print("\nHazard Detection Test:")
-    print(f"Cycles: {stats['cycles']}")
-    print(f"Instructions: {stats['instructions']}")
-    print(f"CPI: {stats['cpi']:.2f}")
-    print(f"Stalls: {stats['stalls']}")
-    print(f"Flushes: {stats['flushes']}")
+    log.debug("\nHazard Detection Test:")
+    log.debug("Cycles: %s", stats['cycles'])
+    log.debug("Instructions: %s", stats['instructions'])
+    log.debug("CPI: %.2f", stats['cpi'])
+    log.debug("Stalls: %s", stats['stalls'])
+    log.debug("Flushes: %s", stats['flushes'])
 
 def test_branch_handling():
     """Test pipeline branch handling."""
@@ -145,12 +105,12 @@ def test_branch_handling():
     
     # Print statistics
     stats = pipeline.get_stats()
-    print("\nBranch Handling Test:")
-    print(f"Cycles: {stats['cycles']}")
-    print(f"Instructions: {stats['instructions']}")
-    print(f"CPI: {stats['cpi']:.2f}")
-    print(f"Stalls: {stats['stalls']}")
-    print(f"Flushes: {stats['flushes']}")
+    log.debug("\nBranch Handling Test:")
+    log.debug("Cycles: %s", stats['cycles'])
+    log.debug("Instructions: %s", stats['instructions'])
+    log.debug("CPI: %.2f", stats['cpi'])
+    log.debug("Stalls: %s", stats['stalls'])
+    log.debug("Flushes: %s", stats['flushes'])
 
 def test_pipeline_disabled():
     """Test pipeline with pipelining disabled."""
@@ -173,14 +133,17 @@ def test_pipeline_disabled():
     
     # Print statistics
     stats = pipeline.get_stats()
-    print("\nPipeline Disabled Test:")
-    print(f"Cycles: {stats['cycles']}")
-    print(f"Instructions: {stats['instructions']}")
-    print(f"CPI: {stats['cpi']:.2f}")
-    print(f"Stalls: {stats['stalls']}")
-    print(f"Flushes: {stats['flushes']}")
+    log.debug("\nPipeline Disabled Test:")
+    log.debug("Cycles: %s", stats['cycles'])
+    log.debug("Instructions: %s", stats['instructions'])
+    log.debug("CPI: %.2f", stats['cpi'])
+    log.debug("Stalls: %s", stats['stalls'])
+    log.debug("Flushes: %s", stats['flushes'])
 
 if __name__ == "__main__":
+    logging.basicConfig(format="%(message)s")
+    if os.environ.get("VERBOSE"):
+        log.setLevel(logging.DEBUG)  # This module's output only, not the simulator's
     print("Running Pipeline Tests...")
     test_sequential_execution()
     test_hazard_detection()
@@ -1,48 +1,19 @@
+import logging
+import os
+import numpy as np
 from memory import MemorySystem
 from pipeline import Pipeline, PipelineStage, HazardType
 from registers import RegisterFile
-from isa import Instruction, InstructionType, Opcode
+from _instr_helpers import create_add_instruction, create_ldr_instruction, create_str_instruction
 
-def create_add_instruction(rd: int, rs1: int, rs2: int) -> int:
-    """Create an ADD instruction."""
-    instr = Instruction(
-        type=InstructionType.ARITHMETIC,
-        opcode=Opcode.ADD,
-        rd=rd,
-        rs1=rs1,
-        rs2=rs2,
-        imm=0
-    )
-    return instr.encode()
-
-def create_ldr_instruction(rd: int, base: int, offset: int) -> int:
-    """Create a LDR instruction."""
-    instr = Instruction(
-        type=InstructionType.MEMORY,
-        opcode=Opcode.LDR,
-        rd=rd,
-        rs1=base,
-        rs2=0,
-        imm=offset
-    )
-    return instr.encode()
-
-def create_str_instruction(rd: int, base: int, offset: int) -> int:
-    """Create a STR instruction."""
-    instr = Instruction(
-        type=InstructionType.MEMORY,
-        opcode=Opcode.STR,
-        rd=rd,
-        rs1=base,
-        rs2=0,
-        imm=offset
-    )
-    return instr.encode()
+# Diagnostic output goes to debug, which is off unless enabled (VERBOSE=1
+# when run as a script, or e.g. pytest --log-cli-level=DEBUG)
+log = logging.getLogger(__name__)
 
 def test_pipeline_cache_interaction():
     """Test interaction between pipeline and cache."""
-    print("\nTesting Pipeline and Cache Interaction:")
-    print("-" * 50)
+    log.debug("\nTesting Pipeline and Cache Interaction:")
+    log.debug("-" * 50)
     
     try:
         # Create memory system with both pipeline and cache enabled
@@ -68,45 +39,46 @@ def test_pipeline_cache_interaction():
         memory.load_program(program)
         
         # Run pipeline for 20 cycles
-        print("Running pipeline for 20 cycles...")
+        log.debug("Running pipeline for 20 cycles...")
         pipeline.run(20)
         
         # Print register values
-        print("\nRegister values after execution:")
-        for i in range(7):
-            print(f"r{i} = {registers.get(i)}")
-        
-        # Print memory values
-        print("\nMemory values:")
-        for addr in range(100, 108, 4):
-            try:
-                value, _ = memory.read(addr)
-                print(f"Memory[{addr}] = {value}")
-            except ValueError as e:
-                print(f"Error reading memory at {addr}: {e}")
+        log.debug("\nRegister values after execution:")
+        values = registers.get_all()
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("\n".join(f"r{i} = {values[i]}" for i in range(7)))
+        
+        # Print memory values (read through the caches, like the program's loads)
+        log.debug("\nMemory values:")
+        addresses = range(100, 108, 4)
+        try:
+            for addr, (value, _) in zip(addresses, memory.read_many(addresses)):
+                log.debug("Memory[%s] = %s", addr, value)
+        except ValueError as e:
+            log.error("Error reading memory: %s", e)
         
         # Print cache statistics
         stats = memory.get_stats()
-        print("\nCache statistics:")
-        print(f"L1 Cache: Hits={stats['L1']['hits']}, Misses={stats['L1']['misses']}, Hit Rate={stats['L1']['hit_rate']:.2f}%")
-        print(f"L2 Cache: Hits={stats['L2']['hits']}, Misses={stats['L2']['misses']}, Hit Rate={stats['L2']['hit_rate']:.2f}%")
+        log.debug("\nCache statistics:")
+        log.debug("L1 Cache: Hits=%s, Misses=%s, Hit Rate=%.2f%%", stats['L1']['hits'], stats['L1']['misses'], stats['L1']['hit_rate'])
+        log.debug("L2 Cache: Hits=%s, Misses=%s, Hit Rate=%.2f%%", stats['L2']['hits'], stats['L2']['misses'], stats['L2']['hit_rate'])
         
         # Print pipeline statistics
         pipeline_stats = pipeline.get_stats()
-        print("\nPipeline statistics:")
-        print(f"Cycles: {pipeline_stats['cycles']}")
-        print(f"Instructions: {pipeline_stats['instructions']}")
-        print(f"CPI: {pipeline_stats['cpi']:.2f}")
-        print(f"Stalls: {pipeline_stats['stalls']}")
-        print(f"Flushes: {pipeline_stats['flushes']}")
+        log.debug("\nPipeline statistics:")
+        log.debug("Cycles: %s", pipeline_stats['cycles'])
+        log.debug("Instructions: %s", pipeline_stats['instructions'])
+        log.debug("CPI: %.2f", pipeline_stats['cpi'])
+        log.debug("Stalls: %s", pipeline_stats['stalls'])
+        log.debug("Flushes: %s", pipeline_stats['flushes'])
         
     except Exception as e:
-        print(f"Error in pipeline-cache interaction test: {e}")
+        log.error("Error in pipeline-cache interaction test: %s", e)
 
 def test_cache_performance():
     """Test cache performance with different access patterns."""
-    print("\nTesting Cache Performance:")
-    print("-" * 50)
+    log.debug("\nTesting Cache Performance:")
+    log.debug("-" * 50)
     
     # Test configurations
     configs = [
@@ -116,9 +88,18 @@ def test_cache_performance():
         ("No Cache, No Pipeline", False, False)
     ]
     
+    # The program is the same for every configuration, so it is built once:
+    # LDR r2, [r1, #i*4] and STR r2, [r1, #i*4] for 16 words, with the
+    # offsets ORed into the immediate field of the encoded templates
+    base_addr = 0x1000  # Use a higher base address to avoid conflicts
+    offsets = np.arange(16, dtype=np.uint32) * 4
+    program = np.empty(32, dtype=np.uint32)
+    program[0::2] = create_ldr_instruction(2, 1, 0) | offsets
+    program[1::2] = create_str_instruction(2, 1, 0) | offsets
+    
     for name, cache_enabled, pipeline_enabled in configs:
-        print(f"\nConfiguration: {name}")
-        print("-" * 30)
+        log.debug("\nConfiguration: %s", name)
+        log.debug("-" * 30)
         
         try:
             # Create memory system with specified configuration
@@ -127,18 +108,9 @@ def test_cache_performance():
             pipeline = Pipeline(memory, registers)
             
             # Initialize registers with a valid base address
-            base_addr = 0x1000  # Use a higher base address to avoid conflicts
             registers.set(1, base_addr)
             
-            # Create a program with sequential memory access
-            program = []
-            for i in range(16):  # Access 16 words
-                offset = i * 4
-                if base_addr + offset < memory.memory.size:  # Check if address is valid
-                    program.append(create_ldr_instruction(2, 1, offset))  # LDR r2, [r1, #i*4]
-                    program.append(create_str_instruction(2, 1, offset))  # STR r2, [r1, #i*4]
-            
-            # Load program
+            # Load program (a uint32 array is copied in without conversion)
             memory.load_program(program)
             
             # Run pipeline
@@ -146,17 +118,17 @@ def test_cache_performance():
             
             # Print statistics
             stats = memory.get_stats()
-            print(f"L1 Cache: Hits={stats['L1']['hits']}, Misses={stats['L1']['misses']}, Hit Rate={stats['L1']['hit_rate']:.2f}%")
-            print(f"L2 Cache: Hits={stats['L2']['hits']}, Misses={stats['L2']['misses']}, Hit Rate={stats['L2']['hit_rate']:.2f}%")
-            print(f"Total cycles: {stats['cycles']}")
+            log.debug("L1 Cache: Hits=%s, Misses=%s, Hit Rate=%.2f%%", stats['L1']['hits'], stats['L1']['misses'], stats['L1']['hit_rate'])
+            log.debug("L2 Cache: Hits=%s, Misses=%s, Hit Rate=%.2f%%", stats['L2']['hits'], stats['L2']['misses'], stats['L2']['hit_rate'])
+            log.debug("Total cycles: %s", stats['cycles'])
             
         except Exception as e:
-            print(f"Error in {name} configuration: {e}")
+            log.error("Error in %s configuration: %s", name, e)
 
 def test_pipeline_hazards():
     """Test pipeline hazard detection and handling."""
-    print("\nTesting Pipeline Hazards:")
-    print("-" * 50)
+    log.debug("\nTesting Pipeline Hazards:")
+    log.debug("-" * 50)
     
     try:
         # Create memory system
@@ -186,27 +158,30 @@ def test_pipeline_hazards():
         memory.load_program(program)
         
         # Run pipeline
-        print("Running pipeline for 15 cycles...")
+        log.debug("Running pipeline for 15 cycles...")
         pipeline.run(15)
         
         # Print register values
-        print("\nRegister values after execution:")
+        log.debug("\nRegister values after execution:")
         for i in range(9):
-            print(f"r{i} = {registers.get(i)}")
+            log.debug("r%s = %s", i, registers.get(i))
         
         # Print pipeline statistics
         stats = pipeline.get_stats()
-        print("\nPipeline statistics:")
-        print(f"Cycles: {stats['cycles']}")
-        print(f"Instructions: {stats['instructions']}")
-        print(f"CPI: {stats['cpi']:.2f}")
-        print(f"Stalls: {stats['stalls']}")
-        print(f"Flushes: {stats['flushes']}")
+        log.debug("\nPipeline statistics:")
+        log.debug("Cycles: %s", stats['cycles'])
+        log.debug("Instructions: %s", stats['instructions'])
+        log.debug("CPI: %.2f", stats['cpi'])
+        log.debug("Stalls: %s", stats['stalls'])
+        log.debug("Flushes: %s", stats['flushes'])
         
     except Exception as e:
-        print(f"Error in pipeline hazards test: {e}")
+        log.error("Error in pipeline hazards test: %s", e)
 
 if __name__ == "__main__":
+    logging.basicConfig(format="%(message)s")
+    if os.environ.get("VERBOSE"):
+        log.setLevel(logging.DEBUG)  # This module's output only, not the simulator's
     # Run all tests
     test_pipeline_cache_interaction()
     test_cache_performance()
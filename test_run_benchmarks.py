@@ -0,0 +1,125 @@
+import numpy as np
+from assembler import Assembler
+from isa import Instruction, InstructionType, Opcode
+from memory import MemorySystem
+from pipeline import Pipeline
+from registers import RegisterFile
+from run_benchmarks import BenchmarkRunner
+
+_HALT_WORD = Instruction(type=InstructionType.ARITHMETIC, opcode=Opcode.HALT,
+                         rd=0, rs1=0, rs2=0, imm=0).encode()
+
+# Control flow is left to the test: these lines are dropped from each block
+_CONTROL_MNEMONICS = ('CMP', 'BEQ', 'BLT', 'JMP', 'HALT')
+
+# Benchmark modes _run_blocks supports
+_UNCACHED_MODES = ('no_cache_no_pipe', 'pipe_only')
+
+def _blocks(source):
+    """Split benchmark source into its labelled blocks of straight-line code.
+    
+    Compares, branches and HALT are dropped, so each block runs on its own.
+    Code before the first label is kept under None.
+    """
+    blocks = {None: []}
+    current = blocks[None]
+    for line in source.splitlines():
+        code = line.split('#')[0].strip()
+        if not code:
+            continue
+        if code.endswith(':'):
+            current = blocks[code[:-1]] = []
+        elif code.split()[0].upper() not in _CONTROL_MNEMONICS:
+            current.append(code)
+    return blocks
+
+def _run_blocks(source, schedule, config, data=()):
+    """Run the blocks of source in schedule order, as the branches would.
+    
+    Control instructions do not decode in this tree and the assembler stops
+    at the first backward BEQ, so the loops cannot run as written. Instead
+    each scheduled block is assembled, written at address 0 followed by HALT
+    and run to completion; registers and data carry over between blocks.
+    
+    data holds (address, values) pairs written to memory first.
+    Only the cache-disabled modes can run this: a write miss allocates an
+    L1 line without filling its other words, so with the cache enabled a
+    store into a line holding code makes later fetches return stale words.
+    
+    Returns:
+        The memory system the blocks ran on
+    """
+    assert not config['cache_enabled']
+    blocks = _blocks(source)
+    memory = MemorySystem(**config)
+    pipeline = Pipeline(memory, RegisterFile())
+    pipeline.enabled = config['pipeline_enabled']
+    for address, values in data:
+        memory.write_range(address, values)
+    assembler = Assembler()
+    for label in schedule:
+        words, errors = assembler.assemble('\n'.join(blocks[label]))
+        assert not errors, (label, errors)
+        memory.write_range(0, words + [_HALT_WORD])
+        pipeline.reset()
+        pipeline.run_for(1000)
+        assert pipeline.halted, label
+    return memory
+
+def _data(memory, start, count):
+    """Read count words from start without a simulated access."""
+    return [memory.peek(start + 4 * i) for i in range(count)]
+
+def test_run_benchmark_stops_on_halt(tmp_path, monkeypatch):
+    """Test that run_benchmark ends the batched run when HALT retires."""
+    monkeypatch.chdir(tmp_path)  # The runner writes its sources under benchmarks/
+    runner = BenchmarkRunner()
+    source = tmp_path / "halt.asm"
+    source.write_text("addi r1, r0, 5\nadd r2, r1, r1\nhalt\n")
+    runner.benchmarks['halt'] = str(source)
+
+    for mode, config in runner.modes.items():
+        stats = runner.run_benchmark('halt', mode, config)
+        assert stats is not None, mode
+        # Far below one batch, let alone the 100000-cycle cap
+        assert 0 < stats['cycles'] < 100, mode
+        if config['pipeline_enabled']:
+            assert stats['instructions'] == 3, mode
+
+def test_prepopulate_matches_init_code(tmp_path, monkeypatch):
+    """Test that prepopulate writes the same data as the include_init code."""
+    monkeypatch.chdir(tmp_path)
+    runner = BenchmarkRunner(include_init=True)
+    cases = {
+        'exchange_sort': (runner.get_exchange_sort_code(), [None] + ['init_loop'] * 10),
+        'matrix_multiply': (runner.get_matrix_multiply_code(),
+                            [None] + ['init_a_loop'] * 16 + ['init_b'] + ['init_b_loop'] * 16
+                            + ['init_c'] + ['init_c_loop'] * 16),
+    }
+    for name, (source, schedule) in cases.items():
+        for mode in _UNCACHED_MODES:
+            config = runner.modes[mode]
+            initialized = _run_blocks(source, schedule, config)
+            prepopulated = MemorySystem(**config)
+            runner.prepopulate(name, prepopulated)
+            # A, B and C (or the array) sit at 0x100, 0x200 and 0x300
+            assert _data(initialized, 0x100, 192) == _data(prepopulated, 0x100, 192), (name, mode)
+    assert _data(prepopulated, 0x100, 4) == [1, 2, 3, 4]  # Elements are 4 bytes apart
+
+def test_matrix_multiply_kernel(tmp_path, monkeypatch):
+    """Test that the pointer-based matrix multiply kernel computes C = A * B."""
+    monkeypatch.chdir(tmp_path)
+    runner = BenchmarkRunner()
+    schedule = [None, 'matrix_mult']
+    for _ in range(4):  # Rows of A
+        schedule.append('outer_loop_mm')
+        for _ in range(4):  # Columns of B
+            schedule += ['middle_loop_mm'] + ['inner_loop_mm'] * 4 + ['store_result']
+        schedule.append('next_row')
+    # B is not all ones, so a wrong row or column stride shows up in C
+    a = np.arange(1, 17).reshape(4, 4)
+    b = np.arange(17, 33).reshape(4, 4)[::-1]
+    for mode in _UNCACHED_MODES:
+        memory = _run_blocks(runner.get_matrix_multiply_code(), schedule, runner.modes[mode],
+                             data=((0x100, a.ravel().tolist()), (0x200, b.ravel().tolist())))
+        assert _data(memory, 0x300, 16) == (a @ b).ravel().tolist(), mode